@@ -0,0 +1,173 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Survival analysis of user churn: Kaplan-Meier curves and Cox proportional hazards
+"""
+
+import argparse
+import os
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+import seaborn as sns
+import warnings
+warnings.filterwarnings('ignore')
+
+from survival import cox_ph, design_matrix, kaplan_meier, logrank_test, median_survival
+
+PROJECT_DIR = '/home/ubuntu/interview_prep/project_1_wekruit'
+
+
+def plot_km(ax, km, label, color):
+    """Step curve with confidence band, starting from S(0) = 1."""
+    t = np.r_[0, km['time']]
+    ax.step(t, np.r_[1, km['survival']], where='post', linewidth=2.5, label=label, color=color)
+    ax.fill_between(t, np.r_[1, km['ci_low']], np.r_[1, km['ci_high']], step='post', alpha=0.25, color=color)
+
+
+def style_km(ax, title):
+    ax.set_xlabel('Days Since Signup', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Survival Probability (Retention Rate)', fontsize=12, fontweight='bold')
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.legend(fontsize=11)
+    ax.grid(alpha=0.3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Wekruit user churn survival analysis')
+    parser.add_argument('--data-dir', default=os.path.join(PROJECT_DIR, 'data'))
+    parser.add_argument('--output-dir', default=PROJECT_DIR,
+                        help='directory holding visualizations/ and reports/')
+    args = parser.parse_args()
+
+    VIS_DIR = os.path.join(args.output_dir, 'visualizations')
+    REPORTS_DIR = os.path.join(args.output_dir, 'reports')
+    os.makedirs(VIS_DIR, exist_ok=True)
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+
+    # Set style
+    sns.set_style("whitegrid")
+    plt.rcParams['figure.figsize'] = (12, 6)
+
+    print("=" * 80)
+    print("WEKRUIT USER RETENTION SURVIVAL ANALYSIS")
+    print("=" * 80)
+
+    retention = pd.read_csv(os.path.join(args.data_dir, 'user_retention.csv'))
+    time = retention['time_observed'].to_numpy()
+    churned = retention['churned'].to_numpy().astype(bool)
+
+    # Activity level: at or above the median number of interviews
+    median_interviews = retention['num_interviews'].median()
+    retention['activity_level'] = np.where(retention['num_interviews'] >= median_interviews,
+                                           'High Activity', 'Low Activity')
+
+    print(f"\nDataset Overview:")
+    print(f"  Total Users: {len(retention):,}")
+    print(f"  Churned: {churned.sum():,} ({churned.mean() * 100:.1f}%)")
+    print(f"  Censored: {(~churned).sum():,}")
+    print(f"  Observation Window: {time.max():.0f} days")
+
+    # ============================================================================
+    # 1. KAPLAN-MEIER CURVES
+    # ============================================================================
+    print("\n" + "=" * 80)
+    print("1. KAPLAN-MEIER CURVES")
+    print("=" * 80)
+
+    km_overall = kaplan_meier(time, churned)
+    overall_median = median_survival(km_overall)['overall']
+    print(f"\nOverall median survival: {overall_median:.1f} days")
+
+    comparisons = {}
+    for column in ['subscription_tier', 'activity_level', 'user_type']:
+        km = kaplan_meier(time, churned, retention[column])
+        test = logrank_test(time, churned, retention[column])
+        comparisons[column] = (km, test)
+        medians = median_survival(km)
+        final = km.groupby('stratum', sort=False)['survival'].last()
+        print(f"\nBy {column} (log-rank χ²={test['statistic']:.2f}, df={test['df']}, p={test['p_value']:.4g}):")
+        for stratum in medians.index:
+            median = f"{medians[stratum]:7.1f} days" if np.isfinite(medians[stratum]) else 'not reached'
+            print(f"  {stratum:15s}: median {median:>12s}, "
+                  f"{time.max():.0f}-day retention {final[stratum] * 100:5.1f}%")
+
+    # ============================================================================
+    # 2. COX PROPORTIONAL HAZARDS
+    # ============================================================================
+    print("\n" + "=" * 80)
+    print("2. COX PROPORTIONAL HAZARDS MODEL")
+    print("=" * 80)
+
+    X, names = design_matrix(retention, numeric=['num_interviews', 'avg_score'],
+                             categorical=['user_type', 'subscription_tier'])
+    cox = cox_ph(time, churned, X, names)
+    cox_summary = cox['summary']
+    cox_summary.to_csv(os.path.join(REPORTS_DIR, 'cox_summary.csv'))
+
+    print(f"\n  Subjects: {cox['n']:,}   Events: {cox['events']:,}   Newton iterations: {cox['iterations']}")
+    print(f"  Partial log-likelihood: {cox['log_likelihood']:.2f}")
+    print(f"  Likelihood ratio test: χ²={cox['lr_statistic']:.2f}, p={cox['lr_p_value']:.4g}")
+    print("\n  Covariate                   HR      95% CI           p")
+    for name, row in cox_summary.iterrows():
+        print(f"  {name:25s} {row['exp(coef)']:6.3f}  [{np.exp(row['coef_lower']):5.3f}, "
+              f"{np.exp(row['coef_upper']):5.3f}]  {row['p']:.4g}")
+    print("  ✓ Saved to: reports/cox_summary.csv")
+
+    # ============================================================================
+    # 3. VISUALIZATIONS
+    # ============================================================================
+    print("\n" + "=" * 80)
+    print("3. GENERATING VISUALIZATIONS")
+    print("=" * 80)
+
+    # Visualization 1: Overall Kaplan-Meier curve
+    fig, ax = plt.subplots(figsize=(12, 6))
+    plot_km(ax, km_overall, 'Overall', '#1f77b4')
+    if np.isfinite(overall_median):
+        ax.axhline(0.5, color='red', linestyle='--', alpha=0.5, label=f'Median: {overall_median:.1f} days')
+    style_km(ax, 'Kaplan-Meier Survival Curve: Overall User Retention')
+    plt.tight_layout()
+    plt.savefig(os.path.join(VIS_DIR, 'km_overall_python.png'), dpi=300, bbox_inches='tight')
+    print("  ✓ Saved: km_overall_python.png")
+    plt.close()
+
+    # Visualizations 2-3: Curves by subscription tier and activity level
+    for column, levels, title, filename in [
+            ('subscription_tier', [('free', 'Free'), ('premium', 'Premium')],
+             'Retention by Subscription Tier', 'km_by_subscription_python.png'),
+            ('activity_level', [('Low Activity', 'Low Activity'), ('High Activity', 'High Activity')],
+             'Retention by Activity Level', 'km_by_activity_python.png')]:
+        km, test = comparisons[column]
+        fig, ax = plt.subplots(figsize=(12, 6))
+        for (stratum, label), color in zip(levels, ['#e74c3c', '#2ecc71']):
+            plot_km(ax, km[km['stratum'] == stratum], label, color)
+        style_km(ax, f"Kaplan-Meier Curves: {title} (p={test['p_value']:.4f})")
+        plt.tight_layout()
+        plt.savefig(os.path.join(VIS_DIR, filename), dpi=300, bbox_inches='tight')
+        print(f"  ✓ Saved: {filename}")
+        plt.close()
+
+    # Visualization 4: Cox hazard ratios (log scale, sorted by effect)
+    ordered = cox_summary.sort_values('coef')
+    fig, ax = plt.subplots(figsize=(10, 6))
+    y = np.arange(len(ordered))
+    ax.errorbar(ordered['coef'], y,
+                xerr=[ordered['coef'] - ordered['coef_lower'], ordered['coef_upper'] - ordered['coef']],
+                fmt='s', color='black', markerfacecolor='white', markersize=7, capsize=4, linewidth=1.5)
+    ax.axvline(0, color='black', linestyle='--', alpha=0.7)
+    ax.set_yticks(y)
+    ax.set_yticklabels(ordered.index)
+    ax.set_xlabel('log(HR) (95% CI)', fontsize=12)
+    ax.set_title('Cox Proportional Hazards Model: Hazard Ratios', fontsize=14, fontweight='bold')
+    plt.tight_layout()
+    plt.savefig(os.path.join(VIS_DIR, 'cox_hazard_ratios_python.png'), dpi=300, bbox_inches='tight')
+    print("  ✓ Saved: cox_hazard_ratios_python.png")
+    plt.close()
+
+    print("\n" + "=" * 80)
+    print("SURVIVAL ANALYSIS COMPLETE")
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
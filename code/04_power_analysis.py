@@ -0,0 +1,133 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Monte Carlo power and minimum detectable effect for the engagement test
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+import seaborn as sns
+import warnings
+warnings.filterwarnings('ignore')
+
+from generator import COMPLETION_PROB, ENGAGEMENT_PROB, FUNNEL_STAGES
+from power import minimum_detectable_effect, power_grid
+
+PROJECT_DIR = '/home/ubuntu/interview_prep/project_1_wekruit'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Wekruit A/B test power analysis')
+    parser.add_argument('--output-dir', default=PROJECT_DIR,
+                        help='directory holding visualizations/ and reports/')
+    parser.add_argument('--sample-sizes', type=int, nargs='+', default=[500, 1000, 2000, 5000, 10000, 20000],
+                        help='total users per experiment')
+    parser.add_argument('--lifts', type=float, nargs='+', default=list(np.round(np.arange(0, 1.01, 0.05), 2)),
+                        help="relative lifts of the treatment's per-competition engagement probability")
+    parser.add_argument('--stage', choices=FUNNEL_STAGES, default='signup',
+                        help='metric: users reaching this stage in any competition (signup = engagement)')
+    parser.add_argument('--replicates', type=int, default=10_000, help='simulated experiments per grid point')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--power', type=float, default=0.8, help='target power for the MDE')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    VIS_DIR = os.path.join(args.output_dir, 'visualizations')
+    REPORTS_DIR = os.path.join(args.output_dir, 'reports')
+    os.makedirs(VIS_DIR, exist_ok=True)
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+
+    # Set style
+    sns.set_style("whitegrid")
+    plt.rcParams['figure.figsize'] = (12, 6)
+
+    print("=" * 80)
+    print("WEKRUIT A/B TEST POWER ANALYSIS")
+    print("=" * 80)
+
+    control_prob = ENGAGEMENT_PROB['control']
+    design_lift = ENGAGEMENT_PROB['treatment'] / control_prob - 1
+    print(f"\nSimulation Setup:")
+    print(f"  Metric: users reaching '{args.stage}' in any competition")
+    print(f"  Control per-competition engagement probability: {control_prob:.3f}")
+    print(f"  Completion probability (both arms): {COMPLETION_PROB['control']:.3f}; "
+          f"lifts apply to engagement only")
+    print(f"  Observed treatment lift in the generator: {design_lift * 100:+.1f}%")
+    print(f"  Grid: {len(args.sample_sizes)} sample sizes x {len(args.lifts)} lifts, "
+          f"{args.replicates:,} replicates per point, α={args.alpha}")
+
+    # ============================================================================
+    # 1. POWER GRID
+    # ============================================================================
+    print("\n" + "=" * 80)
+    print("1. POWER GRID")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    grid = power_grid(args.sample_sizes, args.lifts, stage=args.stage, engagement_prob=control_prob,
+                      replicates=args.replicates, alpha=args.alpha, seed=args.seed, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    grid.to_csv(os.path.join(REPORTS_DIR, 'power_grid.csv'), index=False)
+    print(f"\n  Simulated {len(grid) * args.replicates:,} experiments in {elapsed:.2f}s "
+          f"({elapsed / len(grid) * 1000:.1f} ms per grid point)")
+
+    table = grid.pivot(index='lift', columns='n_users', values='power')
+    print("\nSimulated power (rows: per-competition lift, columns: total users):")
+    print((table * 100).round(1).to_string())
+    print("  ✓ Full grid saved to: reports/power_grid.csv")
+
+    # ============================================================================
+    # 2. MINIMUM DETECTABLE EFFECT
+    # ============================================================================
+    print("\n" + "=" * 80)
+    print("2. MINIMUM DETECTABLE EFFECT")
+    print("=" * 80)
+
+    mde = minimum_detectable_effect(grid, target=args.power)
+    mde.to_csv(os.path.join(REPORTS_DIR, 'mde.csv'), index=False)
+    print(f"\nMDE at {args.power * 100:.0f}% power:")
+    print("  Users   | Per-competition lift | User-level abs lift | User-level rel lift")
+    print("-" * 75)
+    for _, row in mde.iterrows():
+        if np.isnan(row['lift']):
+            print(f"  {row['n_users']:7,.0f} | not reached within the grid")
+            continue
+        print(f"  {row['n_users']:7,.0f} | {row['lift'] * 100:+19.1f}% | {row['abs_lift'] * 100:+15.2f} pp | "
+              f"{row['rel_lift'] * 100:+18.2f}%")
+    print("  ✓ Saved to: reports/mde.csv")
+
+    # ============================================================================
+    # 3. VISUALIZATIONS
+    # ============================================================================
+    print("\n" + "=" * 80)
+    print("3. GENERATING VISUALIZATIONS")
+    print("=" * 80)
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    colors = sns.color_palette('viridis', len(args.sample_sizes))
+    for (n, point), color in zip(grid.groupby('n_users'), colors):
+        point = point.sort_values('abs_lift')
+        ax.plot(point['abs_lift'] * 100, point['power'] * 100, marker='o', linewidth=2.5,
+                markersize=5, color=color, label=f'{n:,} users')
+    ax.axhline(args.power * 100, color='red', linestyle='--', alpha=0.5, label=f'{args.power * 100:.0f}% power')
+    ax.set_xlabel('User-Level Absolute Lift (percentage points)', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Power (%)', fontsize=12, fontweight='bold')
+    ax.set_title('Power Analysis: Engagement Z-Test by Sample Size', fontsize=14, fontweight='bold')
+    ax.legend(fontsize=11)
+    ax.grid(alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(os.path.join(VIS_DIR, 'power_curves.png'), dpi=300, bbox_inches='tight')
+    print("  ✓ Saved: power_curves.png")
+    plt.close()
+
+    print("\n" + "=" * 80)
+    print("POWER ANALYSIS COMPLETE")
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
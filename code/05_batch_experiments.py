@@ -0,0 +1,116 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Run the engagement, funnel and cohort analysis for a batch of experiments
+
+All experiments share one load of the users and activity data; see
+experiments.py for the definition format:
+
+    python code/05_batch_experiments.py --experiments experiments.json --assignments assignments.csv
+"""
+
+import argparse
+import os
+import time
+import pandas as pd
+import warnings
+warnings.filterwarnings('ignore')
+
+from experiments import (join_assignments, load_definitions, parse_definitions, run_batch, shared_state,
+                         state_nbytes, summary_text)
+from generator import FUNNEL_STAGES
+from storage import FORMATS, iter_table_chunks, load_table
+
+PROJECT_DIR = '/home/ubuntu/interview_prep/project_1_wekruit'
+
+# The UI test 02_analysis.py reports on, used when no definitions are given
+DEFAULT_EXPERIMENTS = [{'name': 'new_ui', 'assignment': 'variant_group', 'arms': ['control', 'treatment'],
+                        'metrics': ['signup', 'complete_interview'], 'horizon': 16}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Wekruit batch experiment analysis')
+    parser.add_argument('--data-dir', default=os.path.join(PROJECT_DIR, 'data'))
+    parser.add_argument('--output-dir', default=PROJECT_DIR,
+                        help='directory holding reports/')
+    parser.add_argument('--experiments', default=None, help='JSON file of experiment definitions')
+    parser.add_argument('--assignments', default=None,
+                        help='CSV of extra assignment columns keyed by user_id')
+    parser.add_argument('--format', choices=['auto'] + FORMATS, default='auto')
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help='stream the activity log in chunks of this many rows instead of loading it whole')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    REPORTS_DIR = os.path.join(args.output_dir, 'reports')
+    EXPERIMENTS_DIR = os.path.join(REPORTS_DIR, 'experiments')
+    os.makedirs(EXPERIMENTS_DIR, exist_ok=True)
+
+    print("=" * 80)
+    print("WEKRUIT BATCH EXPERIMENT ANALYSIS")
+    print("=" * 80)
+
+    # ============================================================================
+    # 1. LOAD AND REDUCE THE SHARED DATA
+    # ============================================================================
+    print("\n" + "=" * 80)
+    print("1. LOADING SHARED DATA")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    users = load_table(args.data_dir, 'users', fmt=args.format)
+    if args.assignments:
+        users = join_assignments(users, pd.read_csv(args.assignments))
+    definitions = parse_definitions(load_definitions(args.experiments) if args.experiments else DEFAULT_EXPERIMENTS,
+                                    users.columns, FUNNEL_STAGES)
+
+    activity_columns = ['user_id', 'activity_timestamp', 'activity_type']
+    if args.chunk_rows:
+        activity_chunks = iter_table_chunks(args.data_dir, 'user_activity', activity_columns, args.chunk_rows,
+                                            fmt=args.format)
+    else:
+        activity_chunks = [load_table(args.data_dir, 'user_activity', activity_columns, fmt=args.format)]
+    state = shared_state(users, activity_chunks, definitions, FUNNEL_STAGES)
+    del activity_chunks
+    print(f"\n  Users: {len(users):,}")
+    print(f"  Activities: {state['rows']:,}")
+    print(f"  Experiments: {len(definitions)}")
+    print(f"  Shared per-user state: {state_nbytes(state) / 2 ** 20:.1f} MB "
+          f"(built in {time.perf_counter() - start:.2f}s)")
+
+    # ============================================================================
+    # 2. EXPERIMENTS
+    # ============================================================================
+    print("\n" + "=" * 80)
+    print("2. RUNNING EXPERIMENTS")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    results = run_batch(state, definitions, alpha=args.alpha, workers=args.workers)
+    print(f"\n  Analyzed {len(results)} experiments in {time.perf_counter() - start:.2f}s")
+
+    for result in results:
+        name = result['definition']['name']
+        out_dir = os.path.join(EXPERIMENTS_DIR, name)
+        os.makedirs(out_dir, exist_ok=True)
+        summary = summary_text(result)
+        with open(os.path.join(out_dir, 'summary.txt'), 'w') as f:
+            f.write(summary)
+        result['tests'].to_csv(os.path.join(out_dir, 'tests.csv'), index=False)
+        result['funnel'].to_csv(os.path.join(out_dir, 'funnel.csv'), index=False)
+        result['cohort'].to_csv(os.path.join(out_dir, 'cohort_retention.csv'), index=False)
+        print("\n" + "-" * 80)
+        print(summary)
+        print(f"  ✓ Saved to: reports/experiments/{name}/")
+
+    tests = pd.concat([result['tests'] for result in results], ignore_index=True)
+    tests.to_csv(os.path.join(REPORTS_DIR, 'experiment_tests.csv'), index=False)
+
+    print("\n" + "=" * 80)
+    print("BATCH ANALYSIS COMPLETE")
+    print("=" * 80)
+    print(f"\n  ✓ All metric tests saved to: reports/experiment_tests.csv")
+
+
+if __name__ == '__main__':
+    main()
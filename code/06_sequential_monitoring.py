@@ -0,0 +1,109 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Sequential monitoring: replay the test day by day with always-valid p-values
+
+Feeds the activity log to a sequential monitor (sequential.py) one day at a
+time, as it would arrive in production, and reports when each metric could
+have been called without inflating the false positive rate:
+
+    python code/06_sequential_monitoring.py --data-dir data --output-dir . --window-days 28
+"""
+
+import argparse
+import os
+import time
+import pandas as pd
+import warnings
+warnings.filterwarnings('ignore')
+
+from generator import FUNNEL_STAGES
+from sequential import DEFAULT_METRICS, DEFAULT_TAU, DEFAULT_WINDOW_DAYS, replay, stopping_points
+from storage import FORMATS, load_table
+
+PROJECT_DIR = '/home/ubuntu/interview_prep/project_1_wekruit'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Wekruit sequential A/B test monitoring')
+    parser.add_argument('--data-dir', default=os.path.join(PROJECT_DIR, 'data'))
+    parser.add_argument('--output-dir', default=PROJECT_DIR,
+                        help='directory holding reports/')
+    parser.add_argument('--format', choices=['auto'] + FORMATS, default='auto')
+    parser.add_argument('--metrics', nargs='+', choices=FUNNEL_STAGES, default=DEFAULT_METRICS)
+    parser.add_argument('--granularity', choices=['D', 'W'], default='D', help='monitoring step: day or week')
+    parser.add_argument('--window-days', type=int, default=DEFAULT_WINDOW_DAYS,
+                        help='days after signup a user has to reach each metric stage')
+    parser.add_argument('--tau', type=float, default=DEFAULT_TAU,
+                        help='mixture standard deviation of the lift (roughly the effect size you expect)')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    args = parser.parse_args()
+
+    REPORTS_DIR = os.path.join(args.output_dir, 'reports')
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+
+    print("=" * 80)
+    print("WEKRUIT SEQUENTIAL MONITORING")
+    print("=" * 80)
+
+    # ============================================================================
+    # 1. LOAD DATA
+    # ============================================================================
+    print("\n" + "=" * 80)
+    print("1. LOADING DATA")
+    print("=" * 80)
+
+    users = load_table(args.data_dir, 'users', fmt=args.format)
+    user_activity = load_table(args.data_dir, 'user_activity', ['user_id', 'activity_timestamp', 'activity_type'],
+                               fmt=args.format)
+    print(f"\n  Users: {len(users):,}")
+    print(f"  Activities: {len(user_activity):,}")
+
+    # ============================================================================
+    # 2. REPLAY
+    # ============================================================================
+    print("\n" + "=" * 80)
+    print("2. REPLAYING THE TEST")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    history = replay(users, user_activity, args.granularity, metrics=args.metrics, tau=args.tau, alpha=args.alpha,
+                     window_days=args.window_days)
+    elapsed = time.perf_counter() - start
+    steps = history['until'].nunique()
+    print(f"\n  {steps} steps in {elapsed:.2f}s ({elapsed / steps * 1000:.1f} ms per step)")
+    print(f"  Outcome: stage reached within {args.window_days} days of signup; mSPRT tau={args.tau}")
+
+    history.to_csv(os.path.join(REPORTS_DIR, 'sequential_monitoring.csv'), index=False)
+    print(f"  ✓ Saved to: reports/sequential_monitoring.csv")
+
+    # ============================================================================
+    # 3. STOPPING POINTS
+    # ============================================================================
+    print("\n" + "=" * 80)
+    print("3. STOPPING POINTS")
+    print("=" * 80)
+
+    stops = stopping_points(history, args.alpha)
+    final = history.groupby(['metric', 'arm'], sort=False).last()
+    for _, row in stops.iterrows():
+        last = final.loc[(row['metric'], row['arm'])]
+        print(f"\n{row['metric']} ({row['arm']} vs {last['control']}):")
+        print(f"  Final: {last['control_rate'] * 100:.2f}% → {last['arm_rate'] * 100:.2f}% "
+              f"(lift {last['abs_lift'] * 100:+.2f} pp), always-valid p={last['p_adjusted']:.2g}, "
+              f"95% CS [{last['cs_low'] * 100:+.2f}, {last['cs_high'] * 100:+.2f}] pp")
+        if pd.isna(row['until']):
+            print(f"  Not significant at alpha={args.alpha}; keep the test running")
+        else:
+            print(f"  Significant by {pd.Timestamp(row['until']).date()} "
+                  f"(lift {row['lift_at_stop'] * 100:+.2f} pp), after {row['events_read'] * 100:.1f}% of the activity")
+
+    stops.to_csv(os.path.join(REPORTS_DIR, 'sequential_stopping.csv'), index=False)
+    print(f"\n  ✓ Saved to: reports/sequential_stopping.csv")
+
+    print("\n" + "=" * 80)
+    print("SEQUENTIAL MONITORING COMPLETE")
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    main()
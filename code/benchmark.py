@@ -0,0 +1,293 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Benchmark harness: per-stage time and memory at several dataset scales
+
+Every (scale, format) run generates its dataset with the project's generator
+(or reuses one from an earlier run) and then times the pipeline stage by
+stage, in a fresh worker process so one run's memory doesn't leak into the
+next:
+
+    generate     simulate the dataset and write it (csv or npy)
+    load         read users, competitions and the analysis's activity columns
+                 (CSV dates are left as strings here)
+    dates        convert the date columns to datetime64 (a no-op for npy,
+                 whose timestamps are stored typed)
+    engagement   funnel stage bitmasks, engaged flags and the z-test
+    funnel       funnel counts, step rates and session durations
+    cohort       weekly retention matrix and average retention curves
+    plots        the analysis's three figures at 300 dpi (always redrawn)
+    report       the CSV reports and the summary text
+
+Scales above STREAM_ABOVE users replace load/dates/engagement's log pass with
+a single 'stream' stage over the chunked accumulators, since the log doesn't
+fit in memory there. Each stage records wall and CPU seconds, the peak RSS
+during the stage (the kernel's high-water mark, reset before every stage),
+the RSS after it and the rows it handled. --trace-memory adds the tracemalloc
+peak of the stage's own allocations, at a large cost in speed for
+Python-heavy stages such as CSV writing, so timings from traced runs are not
+comparable with untraced ones. Results are written as JSON; with --baseline the
+run is compared against an earlier file and slower or hungrier stages are
+flagged (exit status 1 if any are). Every result records the settings it ran
+with (user count, streamed chunk size, memory tracing), and a scale and format
+whose baseline ran with other settings is reported and not compared.
+
+    python code/benchmark.py --scales 5k 500k --output benchmark.json
+    python code/benchmark.py --scales 5k 500k --baseline benchmark.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from figures import figure_inputs, render_figures
+from funnel import funnel_counts, funnel_rates, funnel_state, session_frame, session_sums
+from generator import FUNNEL_STAGES, generate
+from instrumentation import environment, new_run, section
+from retention import active_offsets, average_retention, counts_from_offsets, retention_frame
+from significance import two_proportion_ztest
+from storage import FORMATS, has_columnar, iter_table_chunks, load_table, parse_date_columns, read_csv_table
+from streaming import results, stream_aggregates
+
+SCALES = {'5k': 5_000, '500k': 500_000, '50M': 50_000_000}
+STREAM_ABOVE = 5_000_000  # users; larger scales stream the activity log
+CHUNK_ROWS = 2_000_000
+ACTIVITY_COLUMNS = ['user_id', 'competition_id', 'activity_timestamp', 'activity_type', 'session_duration']
+METRICS = ['wall_s', 'cpu_s', 'peak_rss_mb', 'rss_mb', 'peak_alloc_mb']
+RUN_SETTINGS = ['num_users', 'chunk_rows', 'trace_memory']  # must match for timings to be comparable
+
+
+def measure(stage, func, run):
+    """Run func() as one instrumented section of run and return the value of its (value, rows) result."""
+    with section(run, stage) as info:
+        value, info['rows'] = func()
+    return value
+
+
+def _load(data_dir, fmt):
+    if fmt == 'csv':
+        tables = {table: read_csv_table(data_dir, table, columns, parse_dates=False)
+                  for table, columns in [('users', None), ('competitions', None),
+                                         ('user_activity', ACTIVITY_COLUMNS)]}
+    else:
+        tables = {table: load_table(data_dir, table, columns, fmt='npy')
+                  for table, columns in [('users', None), ('competitions', None),
+                                         ('user_activity', ACTIVITY_COLUMNS)]}
+    return tables, sum(len(t) for t in tables.values())
+
+
+def _dates(tables):
+    for table, frame in tables.items():
+        parse_date_columns(frame, table)
+    return tables, len(tables['users']) + len(tables['user_activity'])
+
+
+def _engagement(users, funnel):
+    engaged = (funnel['mask'] & 1).astype(int)
+    by_group = pd.Series(engaged).groupby(users['variant_group'].to_numpy(), observed=True).agg(['sum', 'count'])
+    test = two_proportion_ztest(by_group.loc['control', 'sum'], by_group.loc['control', 'count'],
+                                by_group.loc['treatment', 'sum'], by_group.loc['treatment', 'count'])
+    return {'by_group': by_group, 'test': test}
+
+
+def _plots(out_dir, engagement, funnel_df, avg_retention):
+    rates = engagement['by_group']['sum'] / engagement['by_group']['count'] * 100
+    inputs = figure_inputs(rates.loc['control'], rates.loc['treatment'], funnel_df, avg_retention, FUNNEL_STAGES)
+    return None, len(render_figures(inputs, out_dir, force=True))
+
+
+def _report(out_dir, engagement, funnel_df, cohort_df, sessions):
+    funnel_df.to_csv(os.path.join(out_dir, 'funnel.csv'), index=False)
+    cohort_df.to_csv(os.path.join(out_dir, 'cohort_retention.csv'), index=False)
+    sessions.to_csv(os.path.join(out_dir, 'sessions.csv'), index=False)
+    test = engagement['test']
+    with open(os.path.join(out_dir, 'summary.txt'), 'w') as f:
+        f.write(f"control {float(test['p1']):.4f} treatment {float(test['p2']):.4f} "
+                f"z {float(test['z']):.4f} p {float(test['p_value']):.3g}\n")
+    return None, len(funnel_df) + len(cohort_df) + len(sessions)
+
+
+def run_scale(num_users, fmt, data_dir, out_dir, generate_data=True, chunk_rows=None, trace_memory=False,
+              seed=42):
+    """Benchmark every stage for one dataset. Returns the list of stage records."""
+    run = new_run(trace_memory)
+    step = lambda stage, func: measure(stage, func, run)  # noqa: E731
+    if generate_data:
+        shutil.rmtree(data_dir, ignore_errors=True)
+        step('generate', lambda: (None, sum(generate(num_users, data_dir, seed=seed, fmt=fmt).values())))
+
+    os.makedirs(out_dir, exist_ok=True)
+    if chunk_rows:
+        tables = step('load', lambda: _load_users(data_dir, fmt))
+        users = tables['users']
+
+        def stream():
+            chunks = iter_table_chunks(data_dir, 'user_activity', ACTIVITY_COLUMNS, chunk_rows, fmt=fmt)
+            acc = stream_aggregates(users, chunks, FUNNEL_STAGES, 'W', 16)
+            return results(acc, users), acc['rows']
+        funnel, retention, sessions = step('stream', stream)
+        engagement = step('engagement', lambda: (_engagement(users, funnel), len(users)))
+    else:
+        tables = step('load', lambda: _load(data_dir, fmt))
+        tables = step('dates', lambda: _dates(tables))
+        users, user_activity = tables['users'], tables['user_activity']
+
+        def engagement_stage():
+            state = funnel_state(users, user_activity, FUNNEL_STAGES)
+            return (state, _engagement(users, state)), len(user_activity)
+        funnel, engagement = step('engagement', engagement_stage)
+
+    def funnel_stage():
+        funnel_df = funnel_rates(funnel_counts(funnel), FUNNEL_STAGES)
+        if chunk_rows:
+            return (funnel_df, sessions), len(users)
+        sums = session_sums(users, user_activity, FUNNEL_STAGES)
+        return (funnel_df, session_frame(sums, funnel['groups'], FUNNEL_STAGES)), len(user_activity)
+    funnel_df, sessions = step('funnel', funnel_stage)
+
+    def cohort_stage():
+        if chunk_rows:
+            counts = retention
+        else:
+            counts = counts_from_offsets(users, active_offsets(users, user_activity, 'W', 16), 'W', 16)
+        cohort_df = retention_frame(counts)
+        return (cohort_df, average_retention(cohort_df)), len(users)
+    cohort_df, avg_retention = step('cohort', cohort_stage)
+
+    step('plots', lambda: _plots(out_dir, engagement, funnel_df, avg_retention))
+    step('report', lambda: _report(out_dir, engagement, funnel_df, cohort_df, sessions))
+    return [{'stage': record.pop('name'), **record} for record in run['sections']]
+
+
+def _load_users(data_dir, fmt):
+    tables = {table: load_table(data_dir, table, fmt=fmt) for table in ('users', 'competitions')}
+    return tables, sum(len(t) for t in tables.values())
+
+
+def _has_data(data_dir, fmt):
+    if fmt == 'npy':
+        return has_columnar(data_dir, 'user_activity')
+    return os.path.exists(os.path.join(data_dir, 'user_activity.csv'))
+
+
+def compare(results, baseline, threshold=0.2, min_seconds=0.05, min_mb=5.0):
+    """
+    Stages of results that regressed against baseline: wall or CPU time up
+    by more than threshold (and min_seconds), or a memory peak up by more
+    than threshold (and min_mb). Stages whose baseline ran with other
+    RUN_SETTINGS are not compared. Returns (flag dicts, mismatches), with one
+    mismatch per scale and format: {setting: (baseline, current)}.
+    """
+    key = lambda r: (r['scale'], r['format'], r['stage'])  # noqa: E731
+    previous = {key(r): r for r in baseline['results']}
+    flags, mismatches = [], {}
+    for record in results:
+        old = previous.get(key(record))
+        if old is None:
+            continue
+        changed = {name: (old.get(name), record.get(name)) for name in RUN_SETTINGS
+                   if old.get(name) != record.get(name)}
+        if changed:
+            mismatches[(record['scale'], record['format'])] = changed
+            continue
+        for metric, floor in [('wall_s', min_seconds), ('cpu_s', min_seconds),
+                              ('peak_rss_mb', min_mb), ('peak_alloc_mb', min_mb)]:
+            if not np.isfinite(record.get(metric, np.nan)) or not np.isfinite(old.get(metric, np.nan)):
+                continue
+            if record[metric] > old[metric] * (1 + threshold) and record[metric] - old[metric] > floor:
+                flags.append({'scale': record['scale'], 'format': record['format'], 'stage': record['stage'],
+                              'metric': metric, 'baseline': old[metric], 'current': record[metric],
+                              'change': record[metric] / old[metric] - 1 if old[metric] else np.inf})
+    return flags, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Wekruit pipeline stage by stage')
+    parser.add_argument('--scales', nargs='+', default=['5k', '500k'],
+                        help=f'named scales ({", ".join(SCALES)}) or user counts')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'wekruit_benchmark'),
+                        help='where datasets and stage outputs are written')
+    parser.add_argument('--reuse-data', action='store_true',
+                        help='skip generation when a dataset of that scale and format already exists')
+    parser.add_argument('--chunk-rows', type=int, default=None,
+                        help=f'stream the activity log at every scale (default: only above {STREAM_ABOVE:,} users)')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per scale; the median is reported')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also record tracemalloc allocation peaks (slows Python-heavy stages)')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--baseline', default=None, help='earlier JSON output to flag regressions against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative change that counts as a regression')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("WEKRUIT PIPELINE BENCHMARK")
+    print("=" * 80)
+
+    all_results = []
+    for scale in args.scales:
+        num_users = SCALES[scale] if scale in SCALES else int(scale)
+        chunk_rows = args.chunk_rows or (CHUNK_ROWS if num_users > STREAM_ABOVE else None)
+        for fmt in args.formats:
+            data_dir = os.path.join(args.work_dir, f'{scale}_{fmt}')
+            runs = []
+            for i in range(args.repeat):
+                generate_data = i == 0 and not (args.reuse_data and _has_data(data_dir, fmt))
+                # Fresh process per run, so RSS and allocator state don't carry over
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    runs.append(pool.submit(run_scale, num_users, fmt, data_dir,
+                                            os.path.join(args.work_dir, f'{scale}_{fmt}_out'), generate_data,
+                                            chunk_rows, args.trace_memory).result())
+
+            print(f"\n{scale} users ({num_users:,}), {fmt}{', streamed' if chunk_rows else ''}:")
+            print(f"  {'stage':12s} {'wall s':>9s} {'cpu s':>9s} {'peak MB':>9s} {'rss MB':>9s} {'rows':>14s}"
+                  + (f" {'alloc MB':>9s}" if args.trace_memory else ''))
+            stages = [r['stage'] for r in runs[-1]]
+            for stage in stages:
+                stage_runs = [r for run in runs for r in run if r['stage'] == stage]
+                record = {'scale': scale, 'num_users': num_users, 'format': fmt, 'stage': stage,
+                          'chunk_rows': chunk_rows, 'trace_memory': args.trace_memory,
+                          'runs': len(stage_runs), 'rows': stage_runs[-1]['rows']}
+                for metric in METRICS:
+                    if metric in stage_runs[0]:
+                        record[metric] = float(np.median([r[metric] for r in stage_runs]))
+                all_results.append(record)
+                print(f"  {stage:12s} {record['wall_s']:9.3f} {record['cpu_s']:9.3f} "
+                      f"{record['peak_rss_mb']:9.1f} {record['rss_mb']:9.1f} {record['rows']:14,}"
+                      + (f" {record['peak_alloc_mb']:9.1f}" if args.trace_memory else ''))
+
+    settings = {'formats': args.formats, 'chunk_rows': args.chunk_rows, 'repeat': args.repeat,
+                'trace_memory': args.trace_memory}
+    output = {'environment': environment(), 'settings': settings, 'results': all_results}
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        flags, mismatches = compare(all_results, baseline, args.threshold)
+        output['baseline'] = {'path': args.baseline, 'environment': baseline.get('environment'),
+                              'threshold': args.threshold, 'regressions': flags,
+                              'not_compared': [{'scale': scale, 'format': fmt, 'settings': changed}
+                                               for (scale, fmt), changed in mismatches.items()]}
+        for (scale, fmt), changed in mismatches.items():
+            differences = ', '.join(f'{name} {old} → {new}' for name, (old, new) in changed.items())
+            print(f"\n  ⚠ {scale}/{fmt} not compared: the baseline ran with other settings ({differences})")
+        print(f"\nRegressions against {args.baseline} (>{args.threshold * 100:.0f}%):")
+        for flag in flags:
+            print(f"  ✗ {flag['scale']}/{flag['format']}/{flag['stage']} {flag['metric']}: "
+                  f"{flag['baseline']:.3f} → {flag['current']:.3f} ({flag['change'] * 100:+.0f}%)")
+        if not flags:
+            print("  ✓ None")
+        status = 1 if flags else 0
+
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f"\n  ✓ Results saved to: {args.output}")
+    return status
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
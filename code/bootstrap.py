@@ -0,0 +1,190 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Vectorized bootstrap confidence intervals for engagement, funnel and retention
+
+Users are never resampled row by row. Every user is reduced to an outcome
+pattern (signup cohort, funnel stage bitmask, weeks-after-signup activity
+bitset), and each arm becomes a vector of pattern counts. A replicate is a
+multinomial (or Poisson) draw of those counts, so a block of replicates is
+one weights matrix and its metric sums are one matrix product with the
+pattern feature matrix. Blocks of replicates run in a process pool, each with
+its own seed spawned from the base seed, so results don't depend on the
+number of workers.
+
+Intervals are percentile and BCa (bias-corrected and accelerated, with the
+acceleration from a jackknife over users).
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from scipy.stats import norm
+
+from retention import period_number
+
+BLOCK_SIZE = 1000  # replicates per seeded block
+
+
+def user_patterns(users, stage_mask, active_bits, weeks=(4,), arms=('control', 'treatment'),
+                  group_col='variant_group', granularity='W'):
+    """
+    Distinct outcome patterns per arm. Only the activity bits of the given
+    weeks are kept (bit i is weeks[i]), which keeps the number of patterns
+    small. Returns (arm_counts, patterns): a list of per-arm count vectors and
+    a dict of per-pattern arrays (cohort index, stage mask, activity bits)
+    shared by all arms.
+    """
+    cohorts, cohort = np.unique(period_number(users['signup_date'].to_numpy(), granularity), return_inverse=True)
+    arm = pd.Categorical(users[group_col], categories=list(arms)).codes.astype(np.int64)
+    keep = arm >= 0
+    active_bits = np.asarray(active_bits)[keep].astype(np.int64)
+    selected = np.zeros(keep.sum(), dtype=np.int64)
+    for i, week in enumerate(weeks):
+        selected |= ((active_bits >> week) & 1) << i
+    key = np.stack([cohort[keep], np.asarray(stage_mask)[keep].astype(np.int64), selected], axis=1)
+    patterns, pattern = np.unique(key, axis=0, return_inverse=True)
+    pattern = pattern.reshape(-1)
+    arm_counts = [np.bincount(pattern[arm[keep] == a], minlength=len(patterns)) for a in range(len(arms))]
+    return arm_counts, {'cohort': patterns[:, 0], 'mask': patterns[:, 1], 'bits': patterns[:, 2],
+                        'n_cohorts': len(cohorts)}
+
+
+def feature_matrix(patterns, n_stages, n_weeks):
+    """
+    (patterns, features) matrix whose columns sum to the metric numerators
+    and denominators: users, users reaching each stage, and users per cohort
+    and per cohort active in each of the selected weeks.
+    """
+    n_cohorts = patterns['n_cohorts']
+    in_cohort = (patterns['cohort'][:, None] == np.arange(n_cohorts)).astype(float)
+    columns = [np.ones((len(patterns['cohort']), 1))]
+    columns.append(((patterns['mask'][:, None] >> np.arange(n_stages)) & 1).astype(float))
+    columns.append(in_cohort)
+    for i in range(n_weeks):
+        active = ((patterns['bits'] >> i) & 1).astype(float)
+        columns.append(in_cohort * active[:, None])
+    return np.hstack(columns)
+
+
+def metrics(control, treatment, stages, n_cohorts, weeks, arms=('control', 'treatment')):
+    """
+    Metric values from (replicates, features) sums of both arms: engagement
+    rate and its absolute/relative lift, every funnel step rate (relative to
+    the stage before) per arm, and
+    week-N retention (unweighted mean over non-empty cohorts, as the report
+    uses) per arm and its difference. Returns {name: (replicates,) array}.
+    """
+    out = {}
+    n_stages = len(stages)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name, sums in zip(arms, (control, treatment)):
+            users, reached = sums[:, 0], sums[:, 1:1 + n_stages]
+            out[f'engagement_rate_{name}'] = reached[:, 0] / users
+            for s in range(1, n_stages):
+                out[f'{stages[s]}_rate_{name}'] = reached[:, s] / reached[:, s - 1]
+            sizes = sums[:, 1 + n_stages:1 + n_stages + n_cohorts]
+            for i, week in enumerate(weeks):
+                start = 1 + n_stages + n_cohorts * (i + 1)
+                rates = sums[:, start:start + n_cohorts] / sizes
+                out[f'week_{week}_retention_{name}'] = np.nanmean(np.where(sizes > 0, rates, np.nan), axis=1)
+        c, t = arms
+        out['engagement_abs_lift'] = out[f'engagement_rate_{t}'] - out[f'engagement_rate_{c}']
+        out['engagement_rel_lift'] = out['engagement_abs_lift'] / out[f'engagement_rate_{c}']
+        for week in weeks:
+            out[f'week_{week}_retention_diff'] = out[f'week_{week}_retention_{t}'] - out[f'week_{week}_retention_{c}']
+    return out
+
+
+def _replicate_block(arm_counts, features, replicates, seed, method):
+    """Metric sums of one block of replicates, per arm."""
+    rng = np.random.default_rng(seed)
+    sums = []
+    for counts in arm_counts:
+        if method == 'poisson':
+            weights = rng.poisson(counts, size=(replicates, len(counts)))
+        else:
+            weights = rng.multinomial(counts.sum(), counts / counts.sum(), size=replicates)
+        sums.append(weights @ features)
+    return sums
+
+
+def replicate_sums(arm_counts, features, replicates=10_000, seed=42, method='multinomial', workers=None):
+    """(replicates, features) sums for every arm, computed in seeded blocks over a process pool."""
+    sizes = [min(BLOCK_SIZE, replicates - start) for start in range(0, replicates, BLOCK_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = workers or min(len(sizes), os.cpu_count() or 1)
+    args = [(arm_counts, features, size, block_seed, method) for size, block_seed in zip(sizes, seeds)]
+    if workers <= 1:
+        blocks = [_replicate_block(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            blocks = list(pool.map(_replicate_block, *zip(*args)))
+    return [np.vstack([block[a] for block in blocks]) for a in range(len(arm_counts))]
+
+
+def _jackknife(arm_counts, features, compute):
+    """
+    Leave-one-user-out metric values. Users sharing a pattern give the same
+    value, so it is computed once per (arm, pattern) and weighted by count.
+    Returns ({name: values}, weights).
+    """
+    totals = [counts @ features for counts in arm_counts]
+    values, weights = [], []
+    for a, counts in enumerate(arm_counts):
+        present = np.flatnonzero(counts)
+        left_out = [np.broadcast_to(total, (len(present), len(total))) for total in totals]
+        left_out[a] = totals[a] - features[present]
+        values.append(compute(*left_out))
+        weights.append(counts[present])
+    names = values[0].keys()
+    return {name: np.concatenate([v[name] for v in values]) for name in names}, np.concatenate(weights)
+
+
+def _bca(estimate, replicates, jack, weights, alpha):
+    """BCa interval from bootstrap replicates and weighted jackknife values."""
+    finite = np.isfinite(replicates)
+    replicates = replicates[finite]
+    if replicates.size == 0 or not np.isfinite(estimate):
+        return np.nan, np.nan
+    z0 = norm.ppf(np.clip(np.mean(replicates < estimate), 1e-10, 1 - 1e-10))
+    ok = np.isfinite(jack)
+    jack, weights = jack[ok], weights[ok]
+    mean = np.average(jack, weights=weights)
+    d = mean - jack
+    denom = 6 * np.sum(weights * d ** 2) ** 1.5
+    a = np.sum(weights * d ** 3) / denom if denom > 0 else 0.0
+    z = norm.ppf([alpha / 2, 1 - alpha / 2])
+    adjusted = norm.cdf(z0 + (z0 + z) / (1 - a * (z0 + z)))
+    return tuple(np.quantile(replicates, adjusted))
+
+
+def bootstrap_intervals(users, stage_mask, active_bits, stages, weeks=(4,), arms=('control', 'treatment'),
+                        group_col='variant_group', replicates=10_000, alpha=0.05, seed=42,
+                        method='multinomial', workers=None):
+    """
+    Bootstrap intervals for the report's lift figures. Each arm is resampled
+    separately. Returns a frame with one row per metric: point estimate,
+    bootstrap standard error, percentile and BCa interval bounds.
+    """
+    arm_counts, patterns = user_patterns(users, stage_mask, active_bits, weeks, arms, group_col)
+    features = feature_matrix(patterns, len(stages), len(weeks))
+
+    def compute(control, treatment):
+        return metrics(control, treatment, stages, patterns['n_cohorts'], weeks, arms)
+
+    point = compute(*[(counts @ features)[None, :] for counts in arm_counts])
+    sums = replicate_sums(arm_counts, features, replicates, seed, method, workers)
+    boot = compute(*sums)
+    jack, weights = _jackknife(arm_counts, features, compute)
+
+    rows = []
+    for name, values in boot.items():
+        estimate = float(point[name][0])
+        finite = values[np.isfinite(values)]
+        low, high = np.quantile(finite, [alpha / 2, 1 - alpha / 2]) if finite.size else (np.nan, np.nan)
+        bca_low, bca_high = _bca(estimate, values, jack[name], weights, alpha)
+        std_error = finite.std(ddof=1) if finite.size > 1 else np.nan
+        rows.append({'metric': name, 'estimate': estimate, 'std_error': std_error,
+                     'ci_low': low, 'ci_high': high, 'bca_low': bca_low, 'bca_high': bca_high})
+    return pd.DataFrame(rows)
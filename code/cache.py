@@ -0,0 +1,153 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Content-addressed on-disk cache for analysis intermediates
+
+An entry is keyed by a hash of the input files' contents, the library code
+that computes the intermediates (every module in code/ except the numbered
+scripts, so editing report text or chart styling keeps the cache) and the
+analysis parameters. A script must therefore pass every argument it gives
+the cached computations as a parameter, not only the ones it varies. It holds a dict of named intermediates, so each section
+can fetch its own result or compute and add it:
+
+    entry = load(cache_dir, key) or {}
+    slices = memoize(entry, 'slices', lambda: slice_table(...))
+    store(cache_dir, key, entry, max_bytes)
+
+File contents are hashed once per (size, mtime) and remembered in
+inputs.json, so a rerun over unchanged data only stats the files. Entries are
+pickles written atomically; reading one refreshes its mtime, and storing
+evicts the least recently used entries until the cache fits in max_bytes.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import pickle
+
+from storage import table_files
+
+CACHE_VERSION = 1
+HASH_BLOCK = 8 * 2 ** 20
+
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def input_digests(paths, cache_dir):
+    """Content digest of every path, reusing remembered digests of files whose size and mtime are unchanged."""
+    index_path = os.path.join(cache_dir, 'inputs.json')
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    digests, changed = {}, False
+    for path in paths:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        known = index.get(path)
+        if known is None or known['size'] != stat.st_size or known['mtime_ns'] != stat.st_mtime_ns:
+            known = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': file_digest(path)}
+            index[path], changed = known, True
+        digests[path] = known['digest']
+    if changed:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f'{index_path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp, index_path)
+    return digests
+
+
+def code_digest(code_dir=os.path.dirname(os.path.abspath(__file__))):
+    """Digest of the library modules (code/*.py except the numbered pipeline scripts)."""
+    h = hashlib.blake2b(digest_size=20)
+    for path in sorted(glob.glob(os.path.join(code_dir, '*.py'))):
+        if not os.path.basename(path)[0].isdigit():
+            h.update(os.path.basename(path).encode())
+            h.update(file_digest(path).encode())
+    return h.hexdigest()
+
+
+def cache_key(data_dir, tables, cache_dir, fmt='auto', **params):
+    """Key of the analysis of tables in data_dir with the given parameters."""
+    paths = [path for table in tables for path in table_files(data_dir, table, fmt)]
+    digests = input_digests(paths, cache_dir)
+    material = {
+        'version': CACHE_VERSION,
+        'inputs': [digests[os.path.abspath(p)] for p in paths],
+        'code': code_digest(),
+        'params': params,
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def entry_path(cache_dir, key):
+    return os.path.join(cache_dir, f'{key}.pkl')
+
+
+def load(cache_dir, key):
+    """The cached dict of intermediates for key, or None. A hit marks the entry as recently used."""
+    path = entry_path(cache_dir, key)
+    try:
+        with open(path, 'rb') as f:
+            entry = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    os.utime(path)
+    return entry
+
+
+def memoize(entry, name, compute):
+    """entry[name], computing and adding it first if the entry doesn't have it."""
+    if name not in entry:
+        entry[name] = compute()
+    return entry[name]
+
+
+def evict(cache_dir, max_bytes, keep=None):
+    """Delete least recently used entries until the cache fits in max_bytes. Returns the removed paths."""
+    entries = []
+    for path in glob.glob(os.path.join(cache_dir, '*.pkl')):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        os.remove(path)
+        total -= size
+        removed.append(path)
+    return removed
+
+
+def store(cache_dir, key, entry, max_bytes=1024 * 2 ** 20):
+    """
+    Write the entry atomically and evict older entries beyond max_bytes.
+    An entry larger than max_bytes on its own is not kept. Returns the
+    entry's size in bytes (0 if it wasn't kept).
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = entry_path(cache_dir, key)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    size = os.path.getsize(tmp)
+    if size > max_bytes:
+        os.remove(tmp)
+        return 0
+    os.replace(tmp, path)
+    evict(cache_dir, max_bytes, keep=path)
+    return size
@@ -0,0 +1,287 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+SQLite backend: the tables in a local database, metrics as SQL aggregates
+
+The three tables are bulk-loaded chunk by chunk (storage.iter_table_chunks),
+so building the database never holds the whole log in memory. Timestamps are
+stored as integer seconds since the epoch and categoricals as text, and
+user_activity is indexed on (user_id), (activity_type, user_id) and
+(activity_timestamp):
+
+    conn = build_database(data_dir, 'data/wekruit.sqlite')
+    engagement(conn)                          # engaged/total users per group
+    funnel_rates(funnel_counts(conn))         # same frame as funnel.funnel_counts
+    retention_frame(retention_counts(conn))   # same dict as retention.counts_from_offsets
+
+The database records a digest of the files it was built from (see
+cache.input_digests), and the command line rebuilds it whenever they change,
+so SQL results never come from stale tables.
+
+Each metric is one query whose result set is a few rows per group (or per
+cohort x group x offset), so analyses over long histories never pull the
+raw log into Python. Stage reach is a DISTINCT scan of the covering
+(activity_type, user_id) index. Results match the pandas path exactly; build
+the database and compare both with:
+
+    python code/database.py --data-dir data --compare
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+import numpy as np
+import pandas as pd
+
+from cache import input_digests
+from generator import FUNNEL_STAGES
+from retention import GRANULARITIES
+from storage import SCHEMAS, iter_table_chunks, table_files
+
+CHUNK_ROWS = 500_000
+INDEXES = {
+    'idx_activity_user': 'user_activity (user_id)',
+    'idx_activity_type_user': 'user_activity (activity_type, user_id)',
+    'idx_activity_timestamp': 'user_activity (activity_timestamp)',
+}
+PRIMARY_KEYS = {'users': 'user_id', 'competitions': 'competition_id', 'user_activity': 'activity_id'}
+
+# Period number of an epoch-seconds column, as retention.period_number computes it
+PERIOD_SQL = {
+    'D': '({col} / 86400)',
+    'W': '(({col} / 86400 + 3) / 7)',
+    'M': "((CAST(strftime('%Y', {col}, 'unixepoch') AS INTEGER) - 1970) * 12"
+         " + CAST(strftime('%m', {col}, 'unixepoch') AS INTEGER) - 1)",
+}
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA cache_size = -65536')  # 64 MB page cache; DISTINCT/GROUP BY spill to temp files
+    return conn
+
+
+def _column_sql(column, spec, table):
+    if isinstance(spec, list):
+        kind = 'TEXT'
+    else:
+        kind = 'INTEGER'  # ids, durations, and timestamps as epoch seconds
+    if PRIMARY_KEYS[table] == column:
+        kind += ' PRIMARY KEY'
+    return f'{column} {kind}'
+
+
+def _rows(chunk, columns):
+    values = []
+    for column in columns:
+        series = chunk[column]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values.append(series.to_numpy('datetime64[s]').astype(np.int64).tolist())
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            values.append(series.astype(object).where(series.notna(), None).tolist())
+        else:
+            values.append(series.tolist())
+    return zip(*values)
+
+
+def source_digest(data_dir, cache_dir, fmt='auto'):
+    """Digest of every file the tables are loaded from, as build_database records it."""
+    h = hashlib.blake2b(digest_size=20)
+    for table in SCHEMAS:
+        paths = table_files(data_dir, table, fmt)
+        for path, digest in zip(paths, input_digests(paths, cache_dir).values()):
+            h.update(f'{table}/{os.path.basename(path)}:{digest}\n'.encode())
+    return h.hexdigest()
+
+
+def stored_digest(conn):
+    """The source digest recorded when the database was built (None if it has none)."""
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'source_digest'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def build_database(data_dir, db_path, fmt='auto', chunk_rows=CHUNK_ROWS, digest=None):
+    """
+    (Re)create db_path from the tables in data_dir and return a connection.
+    Indexes are built after the bulk load, which is much faster than
+    maintaining them row by row. digest (see source_digest) is stored in the
+    meta table.
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = connect(db_path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    for table, schema in SCHEMAS.items():
+        columns = list(schema)
+        conn.execute(f"CREATE TABLE {table} ({', '.join(_column_sql(c, s, table) for c, s in schema.items())})")
+        insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        for chunk in iter_table_chunks(data_dir, table, columns, chunk_rows, fmt=fmt):
+            conn.executemany(insert, _rows(chunk, columns))
+        conn.commit()
+    for name, target in INDEXES.items():
+        conn.execute(f'CREATE INDEX {name} ON {target}')
+    conn.execute('ANALYZE')
+    conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+    if digest is not None:
+        conn.execute("INSERT INTO meta VALUES ('source_digest', ?)", (digest,))
+    conn.commit()
+    return conn
+
+
+def table_rows(conn):
+    return {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in SCHEMAS}
+
+
+def _groups(conn, group_col):
+    """Group labels in the order the pandas path uses: the schema's categories, then any others."""
+    spec = SCHEMAS['users'].get(group_col)
+    if not isinstance(spec, list):
+        raise ValueError(f'{group_col!r} is not a categorical column of users')
+    seen = [row[0] for row in conn.execute(f'SELECT DISTINCT {group_col} FROM users WHERE {group_col} IS NOT NULL')]
+    return list(spec) + sorted(g for g in seen if g not in spec)
+
+
+def engagement(conn, group_col='variant_group', stage='signup'):
+    """Users per group and how many of them reached stage at least once."""
+    query = f"""
+        SELECT u.{group_col}, COUNT(*), COUNT(e.user_id)
+        FROM users u
+        LEFT JOIN (SELECT DISTINCT user_id FROM user_activity WHERE activity_type = ?) e USING (user_id)
+        WHERE u.{group_col} IS NOT NULL
+        GROUP BY u.{group_col}
+    """
+    counts = {group: (total, engaged) for group, total, engaged in conn.execute(query, (stage,))}
+    groups = _groups(conn, group_col)
+    frame = pd.DataFrame({
+        group_col: groups,
+        'engaged_users': [counts.get(g, (0, 0))[1] for g in groups],
+        'total_users': [counts.get(g, (0, 0))[0] for g in groups],
+    })
+    frame['engagement_rate'] = frame['engaged_users'] / frame['total_users'] * 100
+    return frame.set_index(group_col)
+
+
+def funnel_counts(conn, stages=FUNNEL_STAGES, group_col='variant_group'):
+    """Users reaching each stage (in any order) per group, shaped like funnel.funnel_counts."""
+    groups = _groups(conn, group_col)
+    reached = pd.DataFrame(0, index=groups, columns=list(stages), dtype=np.int64)
+    query = f"""
+        SELECT u.{group_col}, a.activity_type, COUNT(*)
+        FROM (SELECT DISTINCT activity_type, user_id FROM user_activity) a
+        JOIN users u USING (user_id)
+        WHERE u.{group_col} IS NOT NULL
+        GROUP BY u.{group_col}, a.activity_type
+    """
+    for group, stage, count in conn.execute(query):
+        if stage in reached.columns:
+            reached.loc[group, stage] = count
+    sizes = dict(conn.execute(f'SELECT {group_col}, COUNT(*) FROM users WHERE {group_col} IS NOT NULL '
+                              f'GROUP BY {group_col}').fetchall())
+    funnel_df = reached.reset_index(drop=True)
+    funnel_df.insert(0, 'variant', groups)
+    funnel_df.insert(1, 'users', [sizes.get(g, 0) for g in groups])
+    return funnel_df
+
+
+def retention_counts(conn, granularity='W', horizon=16, group_col='variant_group'):
+    """
+    Cohort x group x offset active-user counts, the same dict as
+    retention.counts_from_offsets (pass it to retention.retention_frame).
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'unknown granularity {granularity!r}; expected one of {list(GRANULARITIES)}')
+    groups = _groups(conn, group_col)
+    signup = PERIOD_SQL[granularity].format(col='u.signup_date')
+    active = PERIOD_SQL[granularity].format(col='a.activity_timestamp')
+    sizes_rows = conn.execute(f'SELECT {signup} AS cohort, u.{group_col}, COUNT(*) FROM users u '
+                              f'GROUP BY cohort, u.{group_col}').fetchall()
+    active_rows = conn.execute(f"""
+        SELECT cohort, grp, offset, COUNT(*) FROM (
+            SELECT DISTINCT a.user_id, {signup} AS cohort, u.{group_col} AS grp, {active} - {signup} AS offset
+            FROM user_activity a JOIN users u USING (user_id)
+            WHERE u.{group_col} IS NOT NULL
+        )
+        WHERE offset >= 0 AND offset < ?
+        GROUP BY cohort, grp, offset
+    """, (horizon,)).fetchall()
+
+    cohorts = np.array(sorted({row[0] for row in sizes_rows}), dtype=np.int64)
+    cohort_pos = {c: i for i, c in enumerate(cohorts.tolist())}
+    group_pos = {g: i for i, g in enumerate(groups)}
+    sizes = np.zeros((len(cohorts), len(groups)), dtype=np.int64)
+    for cohort, group, count in sizes_rows:
+        if group is not None:
+            sizes[cohort_pos[cohort], group_pos[group]] = count
+    counts = np.zeros((len(cohorts), len(groups), horizon), dtype=np.int64)
+    for cohort, group, offset, count in active_rows:
+        counts[cohort_pos[cohort], group_pos[group], offset] = count
+    return {'granularity': granularity, 'cohorts': cohorts, 'groups': groups, 'sizes': sizes, 'active': counts}
+
+
+if __name__ == '__main__':
+    from funnel import funnel_rates, funnel_state
+    from funnel import funnel_counts as pandas_funnel_counts
+    from retention import active_offsets, counts_from_offsets, retention_frame
+    from storage import load_table
+
+    parser = argparse.ArgumentParser(description='Build the SQLite database and compute the metrics in SQL')
+    parser.add_argument('--data-dir', default='/home/ubuntu/interview_prep/project_1_wekruit/data')
+    parser.add_argument('--db-path', default=None, help='database file (default: <data-dir>/wekruit.sqlite)')
+    parser.add_argument('--format', choices=['auto', 'csv', 'npy'], default='auto')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='rebuild the database even if its source tables are unchanged')
+    parser.add_argument('--cache-dir', default=None,
+                        help='where input file digests are remembered (default: <data-dir>/../.cache)')
+    parser.add_argument('--compare', action='store_true', help='also run the pandas path and compare the results')
+    args = parser.parse_args()
+
+    db_path = args.db_path or os.path.join(args.data_dir, 'wekruit.sqlite')
+    cache_dir = args.cache_dir or os.path.join(os.path.dirname(os.path.abspath(args.data_dir)), '.cache')
+    start = time.perf_counter()
+    digest = source_digest(args.data_dir, cache_dir, fmt=args.format)
+    conn = connect(db_path) if os.path.exists(db_path) else None
+    if args.rebuild or conn is None or stored_digest(conn) != digest:
+        if conn is not None:
+            conn.close()
+            if not args.rebuild:
+                print(f"  Source tables changed since {db_path} was built; rebuilding")
+        conn = build_database(args.data_dir, db_path, fmt=args.format, digest=digest)
+        print(f"  ✓ Built {db_path} in {time.perf_counter() - start:.2f}s")
+    print("  " + ", ".join(f"{table}: {rows:,} rows" for table, rows in table_rows(conn).items()))
+
+    timings = {}
+    start = time.perf_counter()
+    sql = {'engagement': engagement(conn)}
+    timings['engagement'] = time.perf_counter() - start
+    sql['funnel'] = funnel_rates(funnel_counts(conn))
+    timings['funnel'] = time.perf_counter() - start - timings['engagement']
+    sql['cohort'] = retention_frame(retention_counts(conn))
+    timings['cohort'] = time.perf_counter() - start - timings['engagement'] - timings['funnel']
+    print("\nSQL aggregates:")
+    for name, elapsed in timings.items():
+        print(f"  {name:12s}: {elapsed:6.2f}s, {len(sql[name]):,} result rows")
+    print(sql['engagement'].to_string())
+
+    if args.compare:
+        start = time.perf_counter()
+        users = load_table(args.data_dir, 'users', fmt=args.format)
+        user_activity = load_table(args.data_dir, 'user_activity',
+                                   ['user_id', 'activity_timestamp', 'activity_type'], fmt=args.format)
+        state = funnel_state(users, user_activity)
+        pandas_funnel = funnel_rates(pandas_funnel_counts(state))
+        pandas_cohort = retention_frame(counts_from_offsets(users, active_offsets(users, user_activity)))
+        print(f"\nPandas path: {time.perf_counter() - start:.2f}s")
+        engaged = pandas_funnel.set_index('variant')['signup']
+        checks = {
+            'engagement': np.array_equal(sql['engagement']['engaged_users'].to_numpy(),
+                                         engaged.loc[sql['engagement'].index].to_numpy()),
+            'funnel': sql['funnel'].equals(pandas_funnel),
+            'cohort': sql['cohort'].equals(pandas_cohort),
+        }
+        for name, same in checks.items():
+            print(f"  {'✓' if same else '✗'} {name}: {'identical' if same else 'DIFFERS'}")
@@ -0,0 +1,229 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Batch analysis of many experiments over one shared user and activity base
+
+Every experiment reads the same activity log, and everything the engagement,
+funnel and cohort sections need from it is per user and independent of the
+assignment: funnel first-reach times and periods-after-signup activity
+bitsets. The log is therefore reduced once (shared_state), and each
+experiment only joins its own assignment codes onto that state, which costs
+O(users) whatever the size of the log.
+
+An experiment definition is a dict (or one entry of a JSON list):
+
+    {"name": "new_ui", "assignment": "variant_group", "arms": ["control", "treatment"],
+     "metrics": ["signup", "complete_interview"], "horizon": 16, "granularity": "W"}
+
+assignment is a column of the users table (or of a joined assignments
+table), arms[0] is the control every other arm is tested against, and
+metrics are the funnel stages whose user-level reach rates get a z-test.
+Experiments run in a process pool. Workers are forked with the state already
+in memory and only read it, so the arrays are shared copy-on-write rather
+than pickled to every worker; where fork is unavailable they are pickled
+once per worker.
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from funnel import NEVER, fold_first_seen, funnel_counts, funnel_rates, user_funnel_state
+from generator import FUNNEL_STAGES
+from retention import (GRANULARITIES, active_offsets, average_retention, counts_from_offsets, retention_frame,
+                       user_index)
+from significance import adjust_pvalues, two_proportion_ztest
+
+DEFAULTS = {'assignment': 'variant_group', 'arms': None, 'metrics': ['signup'], 'horizon': 16, 'granularity': 'W'}
+MAX_HORIZON = 64  # periods held by the activity bitsets
+NAME_PATTERN = re.compile(r'[A-Za-z0-9_.-]+')  # names become report directory names
+
+# State of the running batch, set in each worker by _attach
+_STATE = None
+
+
+def parse_definitions(definitions, columns, stages=FUNNEL_STAGES):
+    """
+    Validate experiment definitions against the available assignment
+    columns and stages and fill in defaults. Raises ValueError on an invalid
+    definition.
+    """
+    parsed, names = [], set()
+    for i, definition in enumerate(definitions):
+        unknown = set(definition) - set(DEFAULTS) - {'name'}
+        if unknown:
+            raise ValueError(f'experiment {i}: unknown keys {sorted(unknown)}')
+        d = {**DEFAULTS, 'name': f'experiment_{i}', **definition}
+        if not isinstance(d['name'], str) or not NAME_PATTERN.fullmatch(d['name']) or not d['name'].strip('.'):
+            raise ValueError(f"experiment {i}: name {d['name']!r} must be letters, digits, '_', '.' or '-' "
+                             "and not only dots")
+        if d['name'] in names:
+            raise ValueError(f"duplicate experiment name {d['name']!r}")
+        names.add(d['name'])
+        if d['assignment'] not in columns:
+            raise ValueError(f"{d['name']}: no assignment column {d['assignment']!r}")
+        if d['arms'] is not None and len(d['arms']) < 2:
+            raise ValueError(f"{d['name']}: needs a control and at least one other arm")
+        bad = [m for m in d['metrics'] if m not in stages]
+        if bad:
+            raise ValueError(f"{d['name']}: metrics {bad} are not funnel stages {list(stages)}")
+        if d['granularity'] not in GRANULARITIES or not 1 <= d['horizon'] <= MAX_HORIZON:
+            raise ValueError(f"{d['name']}: granularity must be one of {list(GRANULARITIES)} "
+                             f"and horizon within 1..{MAX_HORIZON}")
+        parsed.append(d)
+    return parsed
+
+
+def load_definitions(path):
+    """Experiment definitions from a JSON file: a list, or {"experiments": [...]}."""
+    with open(path) as f:
+        definitions = json.load(f)
+    return definitions['experiments'] if isinstance(definitions, dict) else definitions
+
+
+def join_assignments(users, assignments):
+    """Add the assignment columns of another table (keyed by user_id) to users; unmatched users get NaN."""
+    users = users.copy()
+    uidx, valid = user_index(users['user_id'].to_numpy(), assignments['user_id'].to_numpy())
+    for column in assignments.columns.drop('user_id'):
+        values = pd.Categorical(assignments[column])
+        codes = np.full(len(users), -1, dtype=np.int16)
+        codes[uidx] = values.codes[valid]
+        users[column] = pd.Categorical.from_codes(codes, values.categories)
+    return users
+
+
+def shared_state(users, activity_chunks, definitions, stages=FUNNEL_STAGES):
+    """
+    Reduce the activity log (an iterable of chunks, or [whole frame]) to the
+    per-user state every experiment reads: first-reach times per stage,
+    activity bitsets per granularity the definitions use, signup dates and
+    the codes of every assignment column they use.
+    """
+    granularities = sorted({d['granularity'] for d in definitions})
+    first_seen = np.full((len(users), len(stages)), NEVER, dtype=np.int64)
+    active_bits = {g: np.zeros(len(users), dtype=np.uint64) for g in granularities}
+    rows = 0
+    for chunk in activity_chunks:
+        fold_first_seen(users, chunk, stages, first_seen)
+        for g, bits in active_bits.items():
+            active_offsets(users, chunk, g, MAX_HORIZON, bits)
+        rows += len(chunk)
+
+    columns = {}
+    for column in sorted({d['assignment'] for d in definitions}):
+        values = pd.Categorical(users[column])
+        columns[column] = (values.codes, list(values.categories))
+    return {
+        'stages': list(stages),
+        'user_id': users['user_id'].to_numpy(),
+        'signup_date': users['signup_date'].to_numpy(),
+        'first_seen': first_seen,
+        'active_bits': active_bits,
+        'columns': columns,
+        'rows': rows,
+    }
+
+
+def state_nbytes(state):
+    arrays = [state['user_id'], state['signup_date'], state['first_seen'], *state['active_bits'].values(),
+              *(codes for codes, _ in state['columns'].values())]
+    return sum(a.nbytes for a in arrays)
+
+
+def analyze(state, definition, alpha=0.05):
+    """
+    Engagement/metric tests, funnel and cohort retention of one experiment.
+    Returns a dict with the definition, arm sizes and tests, funnel and
+    cohort/retention frames.
+    """
+    codes, categories = state['columns'][definition['assignment']]
+    arms = definition['arms'] or categories
+    lookup = np.array([arms.index(c) if c in arms else -1 for c in categories] + [-1], dtype=np.int16)
+    view = pd.DataFrame({
+        'user_id': state['user_id'],
+        'signup_date': state['signup_date'],
+        'arm': pd.Categorical.from_codes(lookup[codes], arms),
+    }, copy=False)
+
+    stages = state['stages']
+    funnel = user_funnel_state(view, state['first_seen'], stages, group_col='arm')
+    funnel_df = funnel_rates(funnel_counts(funnel), stages)
+
+    # Every metric stage of every arm against arms[0], Holm-adjusted within the experiment
+    counts = funnel_df.set_index('variant')
+    tests = []
+    for metric in definition['metrics']:
+        result = two_proportion_ztest(counts.loc[arms[0], metric], counts.loc[arms[0], 'users'],
+                                      counts.loc[arms[1:], metric].to_numpy(), counts.loc[arms[1:], 'users'].to_numpy(),
+                                      alpha)
+        frame = pd.DataFrame({'metric': metric, 'control': arms[0], 'arm': arms[1:], **result})
+        tests.append(frame.rename(columns={'p1': 'control_rate', 'p2': 'arm_rate'}))
+    tests = pd.concat(tests, ignore_index=True)
+    tests['p_adjusted'] = adjust_pvalues(tests['p_value'], 'holm')
+    tests['significant'] = tests['p_adjusted'] < alpha
+    tests.insert(0, 'experiment', definition['name'])
+
+    granularity, horizon = definition['granularity'], definition['horizon']
+    cohort_df = retention_frame(counts_from_offsets(view, state['active_bits'][granularity], granularity, horizon,
+                                                    group_col='arm'))
+    return {
+        'definition': definition,
+        'arms': list(arms),
+        'arm_sizes': dict(zip(arms, funnel['group_sizes'].tolist())),
+        'tests': tests,
+        'funnel': funnel_df,
+        'cohort': cohort_df,
+        'retention': average_retention(cohort_df),
+    }
+
+
+def _attach(state):
+    global _STATE
+    _STATE = state
+
+
+def _analyze_shared(definition, alpha):
+    return analyze(_STATE, definition, alpha)
+
+
+def run_batch(state, definitions, alpha=0.05, workers=None):
+    """
+    analyze() every definition over the shared state, in a process pool when
+    there is more than one worker. Results come back in definition order.
+    """
+    workers = workers or min(len(definitions), os.cpu_count() or 1)
+    if workers <= 1:
+        return [analyze(state, d, alpha) for d in definitions]
+    # Forked workers inherit the state instead of receiving a pickled copy
+    context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_attach,
+                             initargs=(state,)) as pool:
+        return list(pool.map(_analyze_shared, definitions, [alpha] * len(definitions)))
+
+
+def summary_text(result):
+    """Plain-text summary of one experiment's result."""
+    d = result['definition']
+    lines = [f"EXPERIMENT: {d['name']}",
+             f"Assignment: {d['assignment']} ({', '.join(f'{arm}: {n:,}' for arm, n in result['arm_sizes'].items())})",
+             "", "Metric tests (vs " + result['arms'][0] + ", Holm-adjusted):"]
+    for _, row in result['tests'].iterrows():
+        lines.append(f"  {row['metric']:20s} {row['arm']:>12s}: {row['control_rate'] * 100:6.2f}% → "
+                     f"{row['arm_rate'] * 100:6.2f}% (lift {row['abs_lift'] * 100:+.2f} pp, "
+                     f"{row['rel_lift'] * 100:+.1f}%), z={row['z']:.3f}, p_adj={row['p_adjusted']:.2g}"
+                     f"{' *' if row['significant'] else ''}")
+    lines += ["", "Funnel (users reaching each stage):"]
+    stages = [c for c in result['funnel'].columns if f'{c}_rate' in result['funnel']]
+    for _, row in result['funnel'].iterrows():
+        lines.append(f"  {row['variant']:>12s}: " + " → ".join(f"{row[s]:,.0f}" for s in stages))
+    offset_col = GRANULARITIES[d['granularity']][1]
+    retention = result['retention'].pivot(index=offset_col, columns='variant', values='retention_rate')
+    lines += ["", f"Average retention by {offset_col.replace('_', ' ')}:"]
+    for offset in range(0, d['horizon'], max(d['horizon'] // 4, 1)):
+        lines.append(f"  {offset:3d}: " + " | ".join(f"{arm} {retention.loc[offset, arm]:6.2f}%"
+                                                      for arm in result['arms'] if arm in retention))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,178 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Render pipeline for the analysis figures
+
+The analysis reduces each figure to a few plain numbers (figure_inputs), so a
+figure can be drawn anywhere from a small picklable dict:
+
+    inputs = figure_inputs(control_rate, treatment_rate, funnel_df, avg_retention, stages)
+    render_figures(inputs, vis_dir, fmt='png', dpi=300)
+
+matplotlib and seaborn are imported by the renderer itself, so runs without
+figures never pay for them. Figures that need drawing are rendered
+concurrently in a process pool. Each written file's digest (its inputs, the
+format, the dpi and this module's code) is kept in .figures.json next to the
+figures, and a figure whose digest matches and whose file still exists is
+not redrawn.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import file_digest
+
+FIGURES = ['engagement_comparison', 'funnel_comparison', 'retention_curves']
+FIGURE_FORMATS = ['png', 'svg', 'pdf']
+COLORS = {'control': '#3498db', 'treatment': '#2ecc71'}
+FIGSIZE = {'engagement_comparison': (10, 6), 'funnel_comparison': (12, 6), 'retention_curves': (12, 6)}
+MANIFEST = '.figures.json'
+
+
+def figure_inputs(control_rate, treatment_rate, funnel_df, avg_retention, stages):
+    """
+    The numbers each figure is drawn from: engagement rates (in %) and lift,
+    per-variant users reaching every funnel stage, and the per-variant
+    average retention curve. Returns {figure name: dict of plain values}.
+    """
+    funnel = funnel_df.set_index('variant')
+    curves = {}
+    for variant in ['control', 'treatment']:
+        curve = avg_retention[avg_retention['variant'] == variant]
+        curves[variant] = {'weeks': [int(w) for w in curve['weeks_after']],
+                           'rates': [float(r) for r in curve['retention_rate']]}
+    return {
+        'engagement_comparison': {
+            'rates': [float(control_rate), float(treatment_rate)],
+            'lift': float((treatment_rate - control_rate) / control_rate * 100),
+        },
+        'funnel_comparison': {
+            'stages': list(stages),
+            'counts': {variant: [float(funnel.loc[variant, stage]) for stage in stages]
+                       for variant in ['control', 'treatment']},
+        },
+        'retention_curves': curves,
+    }
+
+
+def _engagement_comparison(ax, data):
+    y = data['rates']
+    bars = ax.bar(['Control', 'Treatment'], y, color=[COLORS['control'], COLORS['treatment']], alpha=0.8,
+                  edgecolor='black', linewidth=1.5)
+
+    # Add value labels on bars
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., height,
+                f'{height:.2f}%',
+                ha='center', va='bottom', fontsize=14, fontweight='bold')
+
+    ax.set_ylabel('Engagement Rate (%)', fontsize=12, fontweight='bold')
+    ax.set_title('A/B Test: User Engagement Rate by Variant', fontsize=14, fontweight='bold')
+    ax.set_ylim(0, max(y) * 1.2)
+    ax.grid(axis='y', alpha=0.3)
+
+    # Add significance annotation
+    ax.text(0.5, max(y) * 1.1, f"Lift: +{data['lift']:.1f}% (p < 0.001)",
+            ha='center', fontsize=12, bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.5))
+
+
+def _funnel_comparison(ax, data):
+    stages = data['stages']
+    x = list(range(len(stages)))
+    width = 0.35
+    for offset, variant in [(-width/2, 'control'), (width/2, 'treatment')]:
+        ax.bar([i + offset for i in x], data['counts'][variant], width, label=variant.title(),
+               color=COLORS[variant], alpha=0.8)
+
+    ax.set_xlabel('Funnel Stage', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Number of Users', fontsize=12, fontweight='bold')
+    ax.set_title('Funnel Analysis: User Journey by Variant', fontsize=14, fontweight='bold')
+    ax.set_xticks(x)
+    ax.set_xticklabels([s.replace('_', ' ').title() for s in stages], rotation=15, ha='right')
+    ax.legend(fontsize=11)
+    ax.grid(axis='y', alpha=0.3)
+
+
+def _retention_curves(ax, data):
+    for variant in ['control', 'treatment']:
+        ax.plot(data[variant]['weeks'], data[variant]['rates'],
+                marker='o', linewidth=2.5, label=variant.title(), color=COLORS[variant], markersize=6)
+
+    ax.set_xlabel('Weeks After Signup', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Retention Rate (%)', fontsize=12, fontweight='bold')
+    ax.set_title('Cohort Retention Analysis: User Retention Over Time', fontsize=14, fontweight='bold')
+    ax.legend(fontsize=11)
+    ax.grid(alpha=0.3)
+    ax.set_xlim(0, 15)
+
+
+DRAW = {
+    'engagement_comparison': _engagement_comparison,
+    'funnel_comparison': _funnel_comparison,
+    'retention_curves': _retention_curves,
+}
+
+
+def render_figure(name, data, path, dpi=300):
+    """Draw one figure from its inputs and save it to path (format from the extension)."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    sns.set_style("whitegrid")
+    fig, ax = plt.subplots(figsize=FIGSIZE[name])
+    DRAW[name](ax, data)
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return path
+
+
+def figure_digest(data, fmt, dpi):
+    """Digest of everything a rendered file depends on."""
+    material = json.dumps({'data': data, 'fmt': fmt, 'dpi': dpi, 'code': file_digest(__file__)}, sort_keys=True)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def render_figures(inputs, vis_dir, fmt='png', dpi=300, workers=None, force=False):
+    """
+    Render every figure of inputs (from figure_inputs) into vis_dir, skipping
+    those whose file is up to date unless force. Returns one dict per figure
+    with its name, path and whether it was rendered.
+    """
+    os.makedirs(vis_dir, exist_ok=True)
+    manifest_path = os.path.join(vis_dir, MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    figures, todo = [], []
+    for name, data in inputs.items():
+        filename = f'{name}.{fmt}'
+        path = os.path.join(vis_dir, filename)
+        digest = figure_digest(data, fmt, dpi)
+        rendered = force or manifest.get(filename) != digest or not os.path.exists(path)
+        figures.append({'figure': name, 'path': path, 'rendered': rendered})
+        if rendered:
+            todo.append((name, data, path, dpi))
+            manifest[filename] = digest
+
+    workers = workers or min(len(todo), os.cpu_count() or 1)
+    if workers <= 1:
+        for args in todo:
+            render_figure(*args)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(render_figure, *zip(*todo)))
+
+    if todo:
+        tmp = f'{manifest_path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, manifest_path)
+    return figures
@@ -0,0 +1,232 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Per-user bitmask funnel engine
+
+One pass over the activity log reduces it to a funnel state: for every unit
+(a user, or a user x competition pair) a bitmask of the stages it reached and
+the first time it reached each of them. Funnel queries then only touch the
+state, so each one costs O(units) whatever the size of the log:
+
+    state = funnel_state(users, user_activity)
+    funnel_counts(state)                                 # any-order, like the original
+    funnel_counts(state, ordered=True)                   # stages must follow each other
+    funnel_counts(state, ordered=True, window_hours=72)  # ... within 72h of the first stage
+"""
+
+import numpy as np
+import pandas as pd
+
+from generator import FUNNEL_STAGES
+from retention import user_index
+
+# First-reach sentinel for stages a unit never reached
+NEVER = np.iinfo(np.int64).max
+
+
+def stage_codes(activity_type, stages=FUNNEL_STAGES):
+    """Stage index of every activity row (-1 for activity types outside the funnel)."""
+    activity_type = pd.Categorical(activity_type)
+    lookup = np.array([stages.index(c) if c in stages else -1 for c in activity_type.categories] + [-1],
+                      dtype=np.int8)
+    # Missing values have code -1, which picks the trailing -1 entry
+    return lookup[activity_type.codes]
+
+
+def funnel_state(users, user_activity, stages=FUNNEL_STAGES, by_competition=False, group_col='variant_group'):
+    """
+    Reduce the activity log to per-unit stage bitmasks and first-reach times.
+
+    Returns a dict with
+        stages:      stage names, bit i is stages[i]
+        groups:      group labels, and group_sizes: users per group
+        user_id:     user of each unit (and competition_id when by_competition)
+        group_codes: group of each unit
+        mask:        uint8/uint16 bitmask of the stages each unit reached
+        first_seen:  (units, stages) first-reach time, seconds since the epoch, NEVER if not reached
+    """
+    if not by_competition:
+        first_seen = fold_first_seen(users, user_activity, stages)
+        return user_funnel_state(users, first_seen, stages, group_col)
+
+    group = pd.Categorical(users[group_col])
+    user_codes = group.codes.astype(np.int64)
+    user_ids = users['user_id'].to_numpy()
+    uidx, stage, seconds, rows = funnel_rows(user_ids, user_activity, stages)
+
+    comp = user_activity['competition_id'].to_numpy()[rows].astype(np.int64)
+    comp_ids, comp_idx = np.unique(comp, return_inverse=True)
+    units, unit = np.unique(uidx * len(comp_ids) + comp_idx, return_inverse=True)
+    unit_user, unit_comp = np.divmod(units, len(comp_ids))
+
+    n_units, n_stages = len(units), len(stages)
+    first_seen = np.full(n_units * n_stages, NEVER, dtype=np.int64)
+    np.minimum.at(first_seen, unit * n_stages + stage, seconds)
+    first_seen = first_seen.reshape(n_units, n_stages)
+    return {
+        'stages': list(stages),
+        'groups': list(group.categories),
+        'group_sizes': np.bincount(user_codes[user_codes >= 0], minlength=len(group.categories)),
+        'user_id': user_ids[unit_user],
+        'competition_id': comp_ids[unit_comp],
+        'group_codes': user_codes[unit_user],
+        'mask': stage_mask(first_seen),
+        'first_seen': first_seen,
+    }
+
+
+def funnel_rows(user_ids, user_activity, stages):
+    """User index, stage index and epoch seconds of the activity rows inside the funnel."""
+    uidx, valid = user_index(user_ids, user_activity['user_id'].to_numpy())
+    stage = stage_codes(user_activity['activity_type'], stages)[valid].astype(np.int64)
+    seconds = user_activity['activity_timestamp'].to_numpy()[valid].astype('datetime64[s]').astype(np.int64)
+    in_funnel = stage >= 0
+    return uidx[in_funnel], stage[in_funnel], seconds[in_funnel], np.flatnonzero(valid)[in_funnel]
+
+
+def fold_first_seen(users, user_activity, stages=FUNNEL_STAGES, first_seen=None):
+    """
+    Per-user first-reach matrix, aligned with the rows of users. Pass
+    first_seen to fold more activity into an existing matrix in place.
+    """
+    if first_seen is None:
+        first_seen = np.full((len(users), len(stages)), NEVER, dtype=np.int64)
+    uidx, stage, seconds, _ = funnel_rows(users['user_id'].to_numpy(), user_activity, stages)
+    np.minimum.at(first_seen.reshape(-1), uidx * len(stages) + stage, seconds)
+    return first_seen
+
+
+def user_funnel_state(users, first_seen, stages=FUNNEL_STAGES, group_col='variant_group'):
+    """Per-user funnel state (see funnel_state) from a first-reach matrix."""
+    group = pd.Categorical(users[group_col])
+    user_codes = group.codes.astype(np.int64)
+    return {
+        'stages': list(stages),
+        'groups': list(group.categories),
+        'group_sizes': np.bincount(user_codes[user_codes >= 0], minlength=len(group.categories)),
+        'user_id': users['user_id'].to_numpy(),
+        'group_codes': user_codes,
+        'mask': stage_mask(first_seen),
+        'first_seen': first_seen,
+    }
+
+
+def stage_mask(first_seen):
+    """Bitmask of reached stages from a first-reach matrix."""
+    reached = first_seen != NEVER
+    dtype = np.uint8 if reached.shape[1] <= 8 else np.uint16
+    weights = (1 << np.arange(reached.shape[1])).astype(dtype)
+    return (reached * weights).sum(axis=1, dtype=dtype)
+
+
+def reached_stages(state, ordered=False, window_hours=None):
+    """
+    (units, stages) boolean matrix of the stages each unit counts as reaching.
+
+    ordered: a stage only counts if the previous one was reached in order and
+        no later than it (first-reach times must be non-decreasing).
+    window_hours: a stage only counts if it was first reached within this many
+        hours of the first stage.
+    """
+    first_seen = state['first_seen']
+    n_stages = first_seen.shape[1]
+    reached = ((state['mask'][:, None] >> np.arange(n_stages)) & 1).astype(bool)
+    if window_hours is not None:
+        elapsed = first_seen - first_seen[:, :1]
+        reached &= reached[:, :1] & (elapsed >= 0) & (elapsed <= window_hours * 3600)
+    if ordered:
+        in_order = np.ones(len(first_seen), dtype=bool)
+        for s in range(n_stages):
+            in_order &= reached[:, s]
+            if s:
+                in_order &= first_seen[:, s] >= first_seen[:, s - 1]
+            reached[:, s] = in_order
+    return reached
+
+
+def funnel_counts(state, ordered=False, window_hours=None):
+    """
+    Units reaching each stage, per group. One row per group with the group's
+    user count and one column per stage.
+    """
+    reached = reached_stages(state, ordered, window_hours)
+    codes = state['group_codes']
+    known = codes >= 0
+    n_groups = len(state['groups'])
+    counts = np.stack([np.bincount(codes[known & reached[:, s]], minlength=n_groups)
+                       for s in range(len(state['stages']))], axis=1)
+    funnel_df = pd.DataFrame(counts, columns=state['stages'])
+    funnel_df.insert(0, 'variant', state['groups'])
+    funnel_df.insert(1, 'users', state['group_sizes'])
+    return funnel_df
+
+
+def funnel_rates(funnel_df, stages=FUNNEL_STAGES):
+    """
+    Add <stage>_rate columns: the first stage relative to the group's users,
+    every later stage relative to the stage before it.
+    """
+    funnel_df = funnel_df.copy()
+    for i, stage in enumerate(stages):
+        base = funnel_df['users'] if i == 0 else funnel_df[stages[i - 1]]
+        funnel_df[f'{stage}_rate'] = funnel_df[stage] / base * 100
+    return funnel_df
+
+
+def empty_session_sums(n_groups, n_stages):
+    shape = (n_groups, n_stages)
+    return {
+        'count': np.zeros(shape, dtype=np.int64),
+        'total': np.zeros(shape, dtype=np.int64),
+        'total_sq': np.zeros(shape, dtype=np.int64),
+        'min': np.full(shape, np.iinfo(np.int64).max, dtype=np.int64),
+        'max': np.full(shape, np.iinfo(np.int64).min, dtype=np.int64),
+    }
+
+
+def session_sums(users, user_activity, stages=FUNNEL_STAGES, group_col='variant_group', sums=None):
+    """
+    Mergeable session_duration statistics per group x stage: event count, sum,
+    sum of squares, min and max, all as exact int64. Pass sums to fold more
+    activity into existing statistics in place.
+    """
+    group = pd.Categorical(users[group_col])
+    if sums is None:
+        sums = empty_session_sums(len(group.categories), len(stages))
+    uidx, stage, _, rows = funnel_rows(users['user_id'].to_numpy(), user_activity, stages)
+    codes = group.codes.astype(np.int64)[uidx]
+    known = codes >= 0
+    cell = (codes * len(stages) + stage)[known]
+    duration = user_activity['session_duration'].to_numpy()[rows][known].astype(np.int64)
+    np.add.at(sums['count'].reshape(-1), cell, 1)
+    np.add.at(sums['total'].reshape(-1), cell, duration)
+    np.add.at(sums['total_sq'].reshape(-1), cell, duration * duration)
+    np.minimum.at(sums['min'].reshape(-1), cell, duration)
+    np.maximum.at(sums['max'].reshape(-1), cell, duration)
+    return sums
+
+
+def merge_session_sums(sums, other):
+    """Combine two sets of session statistics into sums, in place."""
+    for key in ('count', 'total', 'total_sq'):
+        sums[key] += other[key]
+    np.minimum(sums['min'], other['min'], out=sums['min'])
+    np.maximum(sums['max'], other['max'], out=sums['max'])
+    return sums
+
+
+def session_frame(sums, groups, stages=FUNNEL_STAGES):
+    """Tidy session_duration summary (seconds) per group and stage."""
+    count = sums['count'].astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums['total'] / count
+        var = (sums['total_sq'] - sums['total'] * mean) / (count - 1)
+    seen = sums['count'] > 0
+    return pd.DataFrame({
+        'variant': np.repeat(groups, len(stages)),
+        'activity_type': np.tile(stages, len(groups)),
+        'events': sums['count'].ravel(),
+        'mean': mean.ravel(),
+        'std': np.sqrt(np.clip(var, 0, None)).ravel(),
+        'min': np.where(seen, sums['min'], 0).ravel(),
+        'max': np.where(seen, sums['max'], 0).ravel(),
+    })
@@ -0,0 +1,257 @@
+"""
+Project 1.1: Wekruit - A/B Testing for Mock Interview Competitions
+Vectorized simulation engine for users, competitions and user activity
+
+The funnel model is the one the original row-by-row generator used:
+
+    signup -> start_interview -> complete_interview -> view_feedback -> share_result
+
+Every (user, competition) cell draws its whole cascade at once as NumPy
+arrays. Users are simulated in fixed-size blocks of user ids, and each block
+has its own seed derived from (seed, block index), so the output does not
+depend on how many shards or worker processes produced it.
+"""
+
+import glob
+import os
+import warnings
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+# Experiment calendar
+START_DATE = np.datetime64('2025-09-01', 'D')
+END_DATE = np.datetime64('2025-12-31', 'D')
+NUM_COMPETITIONS = 16  # Weekly competitions over 4 months
+SIGNUP_WINDOW_DAYS = 30
+
+# Categorical domains (order defines the stored codes)
+FUNNEL_STAGES = ['signup', 'start_interview', 'complete_interview', 'view_feedback', 'share_result']
+USER_SEGMENTS = ['student', 'professional', 'career_changer']
+SEGMENT_PROBS = [0.5, 0.3, 0.2]
+VARIANTS = ['control', 'treatment']
+VARIANT_PROBS = [0.5, 0.5]
+COMPETITION_TYPES = ['technical', 'behavioral', 'case_study']
+
+# Funnel model
+ENGAGEMENT_PROB = {'control': 0.23, 'treatment': 0.425}
+COMPLETION_PROB = {'control': 0.60, 'treatment': 0.68}
+START_PROB = 0.75     # signup -> start_interview
+FEEDBACK_PROB = 0.85  # complete_interview -> view_feedback
+SHARE_PROB = 0.35     # view_feedback -> share_result
+
+# Users per seeded block; part of the seed definition, so changing it changes the data
+BLOCK_SIZE = 100_000
+
+
+def block_seed(seed, block_index):
+    """Seed for one block of user ids."""
+    return [seed, block_index + 1]
+
+
+def shard_blocks(num_users, num_shards):
+    """Split the user-id blocks into contiguous ranges, one per shard."""
+    num_blocks = -(-num_users // BLOCK_SIZE)
+    edges = np.linspace(0, num_blocks, num_shards + 1).round().astype(int)
+    return [range(edges[i], edges[i + 1]) for i in range(num_shards)]
+
+
+def part_path(data_dir, table, shard=None, num_shards=1, ext='csv'):
+    """Output path of a table, or of one shard's part of it."""
+    if shard is None or num_shards == 1:
+        return os.path.join(data_dir, f'{table}.{ext}')
+    return os.path.join(data_dir, f'{table}.part-{shard:05d}.{ext}')
+
+
+def generate_competitions(seed=42, num_competitions=NUM_COMPETITIONS):
+    """Weekly competitions starting on START_DATE."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'competition_id': np.arange(1, num_competitions + 1, dtype=np.int32),
+        'competition_date': (START_DATE + 7 * np.arange(num_competitions)).astype('datetime64[s]'),
+        'competition_type': pd.Categorical.from_codes(
+            rng.integers(0, len(COMPETITION_TYPES), num_competitions), COMPETITION_TYPES),
+    })
+
+
+def draw_users(rng, n):
+    """Signup day offsets, segment codes and variant codes for n users."""
+    signup_day = rng.integers(0, SIGNUP_WINDOW_DAYS + 1, n).astype(np.int16)
+    segment = rng.choice(len(USER_SEGMENTS), n, p=SEGMENT_PROBS).astype(np.int8)
+    variant = rng.choice(len(VARIANTS), n, p=VARIANT_PROBS).astype(np.int8)
+    return signup_day, segment, variant
+
+
+def draw_funnel_depth(rng, eligible, engagement_prob, completion_prob):
+    """
+    Number of funnel stages reached in every (user, competition) cell.
+
+    eligible is an (n_users, n_competitions) boolean matrix; engagement_prob and
+    completion_prob are per-user arrays. Returns an int8 matrix with values
+    0 (did not sign up) to len(FUNNEL_STAGES) (shared the result).
+    """
+    n, c = eligible.shape
+    u = rng.random((n, c, len(FUNNEL_STAGES)), dtype=np.float32)
+    passed = np.empty(u.shape, dtype=bool)
+    np.less(u[:, :, 0], engagement_prob[:, None], out=passed[:, :, 0])
+    np.less(u[:, :, 1], START_PROB, out=passed[:, :, 1])
+    np.less(u[:, :, 2], completion_prob[:, None], out=passed[:, :, 2])
+    np.less(u[:, :, 3], FEEDBACK_PROB, out=passed[:, :, 3])
+    np.less(u[:, :, 4], SHARE_PROB, out=passed[:, :, 4])
+    passed[:, :, 0] &= eligible
+    return np.logical_and.accumulate(passed, axis=2).sum(axis=2, dtype=np.int8)
+
+
+def expand_activity(rng, depth, user_ids, comp_ids, comp_day, num_competitions):
+    """
+    Turn a funnel depth matrix into activity rows, ordered by user, competition
+    and stage. Timestamps are seconds since START_DATE.
+    """
+    cell = np.flatnonzero(depth)
+    d = depth.ravel()[cell].astype(np.int64)
+    k = cell.size
+
+    # Per-cell timing draws, same ranges as the original generator
+    signup_h = rng.integers(0, 49, k)
+    start_h = rng.integers(48, 97, k)
+    duration = rng.integers(1800, 3601, k)
+    feedback_gap = rng.integers(300, 1801, k)
+    feedback_session = rng.integers(300, 901, k)
+    share_gap = rng.integers(1800, 3601, k)
+    share_session = rng.integers(60, 301, k)
+
+    user_idx, comp_idx = np.divmod(cell, depth.shape[1])
+    comp_sec = comp_day[comp_idx].astype(np.int64) * 86400
+    start_sec = comp_sec + start_h * 3600
+    offsets = np.stack([
+        comp_sec + signup_h * 3600,
+        start_sec,
+        start_sec + duration,
+        start_sec + duration + feedback_gap,
+        start_sec + duration + share_gap,
+    ], axis=1)
+    sessions = np.stack([
+        np.zeros(k, dtype=np.int64),
+        np.zeros(k, dtype=np.int64),
+        duration,
+        feedback_session,
+        share_session,
+    ], axis=1)
+
+    row_cell = np.repeat(np.arange(k), d)
+    stage = np.arange(row_cell.size) - np.repeat(np.cumsum(d) - d, d)
+    user_id = user_ids[user_idx][row_cell]
+    comp_pos = comp_idx[row_cell]
+    activity_id = ((user_id.astype(np.int64) - 1) * num_competitions + comp_pos) * len(FUNNEL_STAGES) + stage + 1
+    return {
+        'activity_id': activity_id,
+        'user_id': user_id,
+        'competition_id': comp_ids[comp_pos],
+        'offset_seconds': offsets[row_cell, stage],
+        'stage': stage.astype(np.int8),
+        'session_duration': sessions[row_cell, stage].astype(np.int32),
+    }
+
+
+def simulate_block(block_index, num_users, competitions, seed=42):
+    """Simulate one block of user ids. Returns (users, user_activity) frames."""
+    rng = np.random.default_rng(block_seed(seed, block_index))
+    first = block_index * BLOCK_SIZE + 1
+    stop = min(first + BLOCK_SIZE, num_users + 1)
+    user_ids = np.arange(first, stop, dtype=np.int32)
+    signup_day, segment, variant = draw_users(rng, user_ids.size)
+
+    comp_ids = competitions['competition_id'].to_numpy(np.int32)
+    comp_day = ((competitions['competition_date'].to_numpy('datetime64[D]') - START_DATE)
+                .astype(np.int64))
+    eligible = comp_day[None, :] >= signup_day[:, None]
+    engagement_prob = np.array([ENGAGEMENT_PROB[v] for v in VARIANTS], dtype=np.float32)[variant]
+    completion_prob = np.array([COMPLETION_PROB[v] for v in VARIANTS], dtype=np.float32)[variant]
+    depth = draw_funnel_depth(rng, eligible, engagement_prob, completion_prob)
+    rows = expand_activity(rng, depth, user_ids, comp_ids, comp_day, len(comp_ids))
+
+    users = pd.DataFrame({
+        'user_id': user_ids,
+        'signup_date': (START_DATE + signup_day).astype('datetime64[s]'),
+        'user_segment': pd.Categorical.from_codes(segment, USER_SEGMENTS),
+        'variant_group': pd.Categorical.from_codes(variant, VARIANTS),
+    })
+    user_activity = pd.DataFrame({
+        'activity_id': rows['activity_id'],
+        'user_id': rows['user_id'],
+        'competition_id': rows['competition_id'],
+        'activity_timestamp': START_DATE.astype('datetime64[s]') + rows['offset_seconds'],
+        'activity_type': pd.Categorical.from_codes(rows['stage'], FUNNEL_STAGES),
+        'session_duration': rows['session_duration'],
+    })
+    return users, user_activity
+
+
+def generate_shard(shard, num_shards, num_users, data_dir, seed=42, fmt='csv'):
+    """
+    Simulate one shard's user-id range and write its output directly: CSV part
+    files, or (fmt='npy') one columnar part per block of user ids.
+    """
+    from storage import table_dir, write_table
+
+    competitions = generate_competitions(seed)
+    paths = {table: part_path(data_dir, table, shard, num_shards) for table in ('users', 'user_activity')}
+    counts = {'users': 0, 'user_activity': 0}
+    for i, block_index in enumerate(shard_blocks(num_users, num_shards)[shard]):
+        frames = dict(zip(('users', 'user_activity'), simulate_block(block_index, num_users, competitions, seed)))
+        for table, frame in frames.items():
+            if fmt == 'npy':
+                write_table(frame, table_dir(data_dir, table), table, part=block_index)
+            else:
+                frame.to_csv(paths[table], mode='w' if i == 0 else 'a', header=i == 0, index=False)
+            counts[table] += len(frame)
+    return counts
+
+
+def generate(num_users, data_dir, num_shards=1, seed=42, workers=None, shards=None, fmt='csv'):
+    """
+    Generate the full dataset (or only the listed shards) into data_dir.
+    A full run first removes the tables' existing CSV and columnar parts, so
+    no output of an earlier, differently sharded run is left to be read.
+    Returns total row counts per table; raises ValueError for shard indexes
+    outside 0..num_shards - 1.
+    """
+    from storage import remove_parts, table_dir, write_table
+
+    full = shards is None
+    shards = list(range(num_shards)) if full else list(shards)
+    bad = [s for s in shards if not 0 <= s < num_shards]
+    if bad:
+        raise ValueError(f'shard indexes {bad} outside 0..{num_shards - 1}')
+    blocks = shard_blocks(num_users, num_shards)
+    empty = [s for s in shards if not len(blocks[s])]
+    if empty:
+        warnings.warn(f'shards {empty} get no users: shards split {BLOCK_SIZE:,}-user blocks and '
+                      f'{num_users:,} users make {sum(len(b) for b in blocks)} block(s)')
+
+    os.makedirs(data_dir, exist_ok=True)
+    if full:
+        for table in ('users', 'competitions', 'user_activity'):
+            for path in glob.glob(os.path.join(data_dir, f'{table}.part-*.csv')) + [part_path(data_dir, table)]:
+                if os.path.exists(path):
+                    os.remove(path)
+            remove_parts(table_dir(data_dir, table))
+    competitions = generate_competitions(seed)
+    if fmt == 'npy':
+        write_table(competitions, table_dir(data_dir, 'competitions'), 'competitions')
+    else:
+        competitions.to_csv(part_path(data_dir, 'competitions'), index=False)
+    workers = workers or min(len(shards), os.cpu_count() or 1)
+
+    if workers <= 1:
+        results = [generate_shard(s, num_shards, num_users, data_dir, seed, fmt) for s in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(generate_shard, s, num_shards, num_users, data_dir, seed, fmt) for s in shards]
+            results = [f.result() for f in futures]
+
+    totals = {'users': 0, 'competitions': len(competitions), 'user_activity': 0}
+    for counts in results:
+        totals['users'] += counts['users']
+        totals['user_activity'] += counts['user_activity']
+    return totals
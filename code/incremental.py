@@ -0,0 +1,196 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Incremental aggregation over the append-only activity log
+
+The analysis only needs the per-user sufficient statistics of a streaming
+accumulator (see streaming.py):
+
+    first_seen:  (users, stages) first-reach time of every funnel stage,
+                 which gives the engaged flags and every funnel count
+    active_bits: bitset of the weeks after signup the user was active in,
+                 which gives the cohort x week retention matrix
+    sessions:    group x stage session_duration sums
+    type_bits:   per-user competition types each stage was reached in
+
+All of them merge with min / bitwise-or / addition, so a run folds in only
+the activity rows appended since the last one and gets the same z-test,
+funnel rates and retention curves as a full recompute. The log is read from
+its CSV files (a columnar copy is stale as soon as rows are appended), and
+the state records the byte offset folded up to in each file with the size
+and modification time it had then. The next run seeks past the folded bytes
+without reading them, so its cost grows with the new rows only.
+
+activity_id must grow in file order, as it does in the generator's output
+and in any log that appends rows with new ids: the last folded id is the
+high-water mark, and new rows at or below it raise ValueError instead of
+being folded in or dropped. A file that shrank, or whose row at the mark
+changed, means the folded history was rewritten; the state is then rebuilt
+from the start of the log. A row whose user is not in the users table yet
+stops the fold before it, so it is folded by a later run once the user has
+been added rather than dropped.
+"""
+
+import os
+import warnings
+import numpy as np
+import pandas as pd
+
+from retention import user_index
+from storage import csv_stamp, iter_csv_rows
+from streaming import CHUNK_ROWS, accumulate, new_accumulator
+
+SESSION_KEYS = ['count', 'total', 'total_sq', 'min', 'max']
+
+
+def empty_state(users, stages, granularity='W', horizon=16, group_col='variant_group', competitions=None):
+    state = new_accumulator(users, stages, granularity, horizon, group_col, competitions)
+    state.update({
+        'user_id': users['user_id'].to_numpy().astype(np.int64),
+        'groups': list(pd.Categorical(users[group_col]).categories),
+        'hwm_activity_id': np.iinfo(np.int64).min,
+        'hwm_file': '',
+        'hwm_offset': 0,
+        'log': {},
+    })
+    return state
+
+
+def load_state(path, users, stages, granularity='W', horizon=16, group_col='variant_group', competitions=None):
+    """
+    Saved state aligned with the rows of users, or an empty one if there is
+    none or it was built with other parameters.
+    """
+    state = empty_state(users, stages, granularity, horizon, group_col, competitions)
+    if not os.path.exists(path):
+        return state
+    with np.load(path) as saved:
+        if (list(saved['stages']) != list(stages) or str(saved['granularity']) != granularity
+                or int(saved['horizon']) != horizon or str(saved['group_col']) != group_col
+                or list(saved['groups']) != state['groups']
+                or ('type_bits' in saved) != (state['type_bits'] is not None) or 'log_files' not in saved):
+            return state
+
+        # Reorder the per-user arrays to the current users table; new users start empty
+        old, known = user_index(saved['user_id'], state['user_id'])
+        state['first_seen'][known] = saved['first_seen'][old]
+        state['active_bits'][known] = saved['active_bits'][old]
+        if state['type_bits'] is not None:
+            state['type_bits'][known] = saved['type_bits'][old]
+        state['sessions'] = {key: saved[f'sessions_{key}'] for key in SESSION_KEYS}
+        state['rows'] = int(saved['rows'])
+        state['hwm_activity_id'] = int(saved['hwm_activity_id'])
+        state['hwm_file'] = str(saved['hwm_file'])
+        state['hwm_offset'] = int(saved['hwm_offset'])
+        state['log'] = {str(name): {'offset': int(offset), 'size': int(size), 'mtime_ns': int(mtime)}
+                        for name, offset, size, mtime in zip(saved['log_files'], saved['log_offsets'],
+                                                             saved['log_sizes'], saved['log_mtimes'])}
+    return state
+
+
+def save_state(path, state):
+    """Write the state atomically, so an interrupted run leaves the previous one intact."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    log = state['log']
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(
+            f,
+            user_id=state['user_id'],
+            first_seen=state['first_seen'],
+            active_bits=state['active_bits'],
+            stages=np.array(state['stages']),
+            groups=np.array(state['groups']),
+            group_col=np.array(state['group_col']),
+            granularity=np.array(state['granularity']),
+            horizon=np.array(state['horizon']),
+            rows=np.array(state['rows']),
+            hwm_activity_id=np.array(state['hwm_activity_id']),
+            hwm_file=np.array(state['hwm_file']),
+            hwm_offset=np.array(state['hwm_offset']),
+            log_files=np.array(list(log), dtype=str),
+            log_offsets=np.array([f['offset'] for f in log.values()], dtype=np.int64),
+            log_sizes=np.array([f['size'] for f in log.values()], dtype=np.int64),
+            log_mtimes=np.array([f['mtime_ns'] for f in log.values()], dtype=np.int64),
+            **{f'sessions_{key}': state['sessions'][key] for key in SESSION_KEYS},
+            **({} if state['type_bits'] is None else {'type_bits': state['type_bits']}),
+        )
+    os.replace(tmp, path)
+
+
+def fold(state, users, user_activity):
+    """
+    Fold one frame of newly appended activity into the state, up to its first
+    row whose user is not in users, and advance the high-water mark. Returns
+    the number of rows folded. Raises ValueError if its activity_ids are not
+    all past the mark and increasing.
+    """
+    ids = user_activity['activity_id'].to_numpy()
+    if len(ids) and (ids[0] <= state['hwm_activity_id'] or np.any(ids[1:] <= ids[:-1])):
+        raise ValueError("new activity rows have activity_id at or below the high-water mark "
+                         f"{state['hwm_activity_id']} (or out of order); the log must be appended in "
+                         "activity_id order; delete the state file to rebuild it")
+    _, known = user_index(state['user_id'], user_activity['user_id'].to_numpy())
+    rows = len(ids) if known.all() else int(np.argmin(known))
+    if rows:
+        accumulate(state, users, user_activity.iloc[:rows])
+        state['hwm_activity_id'] = int(ids[rows - 1])
+    return rows
+
+
+def _unchanged(state, data_dir, stamp):
+    """Whether the folded bytes of every log file are still there and the row at the mark is unchanged."""
+    current = {f['file']: f for f in stamp}
+    for name, folded in state['log'].items():
+        if name not in current or current[name]['size'] < folded['offset']:
+            return False
+    name = state['hwm_file']
+    if not name or (current[name]['size'], current[name]['mtime_ns']) == (state['log'][name]['size'],
+                                                                        state['log'][name]['mtime_ns']):
+        return True
+    rows = iter_csv_rows(os.path.join(data_dir, name), 'user_activity', ['activity_id'], state['hwm_offset'],
+                         state['log'][name]['offset'])
+    try:
+        frame, _ = next(rows, (None, None))
+    except ValueError:
+        # The bytes at the mark no longer parse as a row
+        return False
+    return frame is not None and len(frame) == 1 and frame['activity_id'].iat[0] == state['hwm_activity_id']
+
+
+def update(path, users, data_dir, columns, stages, granularity='W', horizon=16, group_col='variant_group',
+           competitions=None, chunk_rows=CHUNK_ROWS):
+    """
+    Load the saved state, fold in the activity rows of data_dir appended
+    since it was saved and save it. Returns (state, new row count); the
+    state is a streaming accumulator, so streaming.results() turns it into
+    the analysis inputs. The state is rebuilt from the start of the log if
+    its folded part has changed.
+    """
+    state = load_state(path, users, stages, granularity, horizon, group_col, competitions)
+    stamp = csv_stamp(data_dir, 'user_activity')
+    if not _unchanged(state, data_dir, stamp):
+        warnings.warn(f'the activity log rows folded into {path} have changed; rebuilding it from the start')
+        state = empty_state(users, stages, granularity, horizon, group_col, competitions)
+    columns = ['activity_id', 'user_id'] + [c for c in columns if c not in ('activity_id', 'user_id')]
+    new_rows = 0
+    for f in stamp:
+        folded = state['log'].get(f['file'], {}).get('offset')
+        rows = iter_csv_rows(os.path.join(data_dir, f['file']), 'user_activity', columns, folded, f['size'],
+                             chunk_rows)
+        held = None
+        for chunk, offsets in rows:
+            folded = fold(state, users, chunk)
+            new_rows += folded
+            if folded:
+                state['hwm_file'], state['hwm_offset'] = f['file'], int(offsets[folded - 1])
+                state['log'][f['file']] = {'offset': int(offsets[folded]), 'size': f['size'],
+                                           'mtime_ns': f['mtime_ns']}
+            if folded < len(chunk):
+                held = chunk.iloc[folded]
+                break
+        if held is not None:
+            warnings.warn(f"activity_id {held['activity_id']} belongs to user_id {held['user_id']}, who is not "
+                          "in the users table yet; the rows from it on are folded once the user is added")
+            break
+    save_state(path, state)
+    return state, new_rows
@@ -0,0 +1,172 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Per-section timing, memory and profiling hooks for the pipeline scripts
+
+A run is a dict collecting one record per section:
+
+    run = new_run(trace_memory=False, profile_section='funnel', profile_path='reports/funnel.prof')
+    begin(run, 'funnel')
+    ...
+    end(run, rows=len(users))
+    write_run(run, 'reports/run_metrics.json')
+
+Every record has wall and CPU seconds, the peak RSS during the section (the
+kernel's high-water mark, reset when the section begins; Linux only), the
+RSS at its end and the rows it processed. With trace_memory the tracemalloc
+peak of the section's own allocations is added too (NumPy and pandas buffers
+included), which slows Python-heavy code noticeably. The section named by
+profile_section runs under cProfile: its stats are dumped to profile_path
+and the top functions by cumulative time are kept in the record.
+"""
+
+import cProfile
+import json
+import os
+import platform
+import pstats
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+PROFILE_TOP = 25  # functions kept in the record of a profiled section
+
+
+def status_mb(field):
+    """A memory field of /proc/self/status (VmRSS, VmHWM, ...) in MB, NaN where unavailable."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return np.nan
+
+
+def reset_peak_rss():
+    """Reset the kernel's RSS high-water mark (Linux), so VmHWM is the peak from here on."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def environment():
+    """Versions, platform and git commit of the running code."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def new_run(trace_memory=False, profile_section=None, profile_path=None):
+    return {
+        'sections': [],
+        'trace_memory': trace_memory,
+        'profile_section': profile_section,
+        'profile_path': profile_path,
+        'started': time.perf_counter(),
+        'open': None,
+    }
+
+
+def begin(run, name):
+    """Start measuring section name, closing the previous one if it is still open."""
+    if run['open'] is not None:
+        end(run)
+    reset_peak_rss()
+    profiler = None
+    if name == run['profile_section']:
+        profiler = cProfile.Profile()
+    if run['trace_memory']:
+        tracemalloc.start()
+    run['open'] = {'name': name, 'wall': time.perf_counter(), 'cpu': time.process_time(), 'profiler': profiler}
+    if profiler is not None:
+        profiler.enable()
+
+
+def end(run, rows=None):
+    """Finish the open section and return its record."""
+    state, run['open'] = run['open'], None
+    if state['profiler'] is not None:
+        state['profiler'].disable()
+    record = {
+        'name': state['name'],
+        'wall_s': time.perf_counter() - state['wall'],
+        'cpu_s': time.process_time() - state['cpu'],
+        'peak_rss_mb': status_mb('VmHWM'),
+        'rss_mb': status_mb('VmRSS'),
+        'rows': None if rows is None else int(rows),
+    }
+    if run['trace_memory']:
+        record['peak_alloc_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    if state['profiler'] is not None:
+        record['profile'] = _profile_summary(state['profiler'], run['profile_path'])
+    run['sections'].append(record)
+    return record
+
+
+@contextmanager
+def section(run, name):
+    """begin/end around a with block; set 'rows' on the yielded dict to record a row count."""
+    info = {}
+    begin(run, name)
+    try:
+        yield info
+    finally:
+        end(run, info.get('rows'))
+
+
+def _profile_summary(profiler, path):
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        profiler.dump_stats(path)
+    stats = pstats.Stats(profiler)
+    top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP]
+    return {
+        'path': path,
+        'total_calls': stats.total_calls,
+        'top': [{'function': f'{filename}:{line}({func})', 'ncalls': ncalls, 'tottime': tottime, 'cumtime': cumtime}
+                for (filename, line, func), (_, ncalls, tottime, cumtime, _) in top],
+    }
+
+
+def write_run(run, path, history_path=None, **metadata):
+    """
+    Write the run's records (and metadata such as the run options) as JSON,
+    and append a one-line copy to history_path so runs can be compared over
+    time. Returns the written dict.
+    """
+    if run['open'] is not None:
+        end(run)
+    output = {
+        'environment': environment(),
+        'argv': sys.argv,
+        **metadata,
+        'trace_memory': run['trace_memory'],
+        'total_wall_s': time.perf_counter() - run['started'],
+        'sections': run['sections'],
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(output, f, indent=2, default=float)
+    if history_path:
+        with open(history_path, 'a') as f:
+            f.write(json.dumps(output, default=float) + '\n')
+    return output
@@ -0,0 +1,151 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Monte Carlo power and minimum detectable effect for the engagement z-test
+
+Replicate experiments come from the generator's funnel model: users split
+between the arms with VARIANT_PROBS, sign up uniformly over the signup
+window, are eligible for every competition on or after their signup day, and
+each (user, competition) cell runs the signup -> start -> complete ->
+feedback -> share cascade with the generator's step probabilities.
+
+The z-test only sees whether each user reached the metric stage in any
+competition. A cell reaches stage s with probability q_s (the product of the
+step probabilities up to s), so a user eligible for k competitions is a
+success with probability 1 - (1 - q_s)^k. A replicate is therefore fully
+described by per-arm multinomial counts of users per k and binomial success
+counts per k, which draws exactly the same distribution of test inputs as
+simulating every cell with draw_funnel_depth, at a cost independent of the
+number of users. Each grid point draws all its replicates as one batch of
+arrays, with its own seed spawned from the base seed, and grid points run
+in a process pool.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from scipy.stats import norm
+
+from generator import (COMPLETION_PROB, ENGAGEMENT_PROB, FEEDBACK_PROB, FUNNEL_STAGES, NUM_COMPETITIONS,
+                       SHARE_PROB, SIGNUP_WINDOW_DAYS, START_PROB, VARIANT_PROBS)
+from significance import two_proportion_ztest
+
+
+def cell_stage_prob(engagement_prob, completion_prob, stage='signup'):
+    """Probability that one (user, competition) cell reaches stage."""
+    steps = [engagement_prob, START_PROB, completion_prob, FEEDBACK_PROB, SHARE_PROB]
+    return float(np.prod(steps[:FUNNEL_STAGES.index(stage) + 1]))
+
+
+def eligibility(num_competitions=NUM_COMPETITIONS, signup_window_days=SIGNUP_WINDOW_DAYS):
+    """
+    Distribution of the number of competitions a user is eligible for, with
+    weekly competitions from day 0 and uniform signup days. Returns
+    (k values, probabilities).
+    """
+    comp_day = 7 * np.arange(num_competitions)
+    signup_day = np.arange(signup_window_days + 1)
+    eligible = (comp_day[None, :] >= signup_day[:, None]).sum(axis=1)
+    k, count = np.unique(eligible, return_counts=True)
+    return k, count / count.sum()
+
+
+def user_success_prob(cell_prob, k):
+    """Probability that a user eligible for k competitions reaches the stage in at least one."""
+    return 1 - (1 - cell_prob) ** np.asarray(k)
+
+
+def _simulate_point(n_users, cell_probs, k, k_weights, replicates, alpha, seed):
+    """Power and mean arm rates of one grid point from one batch of replicates."""
+    rng = np.random.default_rng(seed)
+    n_treatment = rng.binomial(n_users, VARIANT_PROBS[1], replicates)
+    counts = []
+    for n_arm, cell_prob in zip((n_users - n_treatment, n_treatment), cell_probs):
+        by_k = rng.multinomial(n_arm, k_weights)
+        successes = rng.binomial(by_k, user_success_prob(cell_prob, k)).sum(axis=1)
+        counts.append((successes, n_arm))
+    (x1, n1), (x2, n2) = counts
+    test = two_proportion_ztest(x1, n1, x2, n2, alpha)
+    return {
+        'power': float(np.mean(test['p_value'] < alpha)),
+        'sim_control_rate': float(np.nanmean(test['p1'])),
+        'sim_treatment_rate': float(np.nanmean(test['p2'])),
+    }
+
+
+def analytic_power(p1, p2, n1, n2, alpha=0.05):
+    """Normal-approximation power of the two-sided pooled z-test."""
+    p_pool = (n1 * p1 + n2 * p2) / (n1 + n2)
+    se_null = np.sqrt(p_pool * (1 - p_pool) * (1 / n1 + 1 / n2))
+    se_alt = np.sqrt(p1 * (1 - p1) / n1 + p2 * (1 - p2) / n2)
+    z = norm.ppf(1 - alpha / 2)
+    diff = np.abs(p2 - p1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return norm.sf((z * se_null - diff) / se_alt) + norm.cdf((-z * se_null - diff) / se_alt)
+
+
+def power_grid(sample_sizes, lifts, stage='signup', engagement_prob=ENGAGEMENT_PROB['control'],
+               completion_prob=COMPLETION_PROB['control'], replicates=10_000, alpha=0.05, seed=42, workers=None):
+    """
+    Simulated power of the z-test on users reaching stage, for every total
+    sample size and relative lift of the treatment's per-competition
+    engagement probability over engagement_prob (0.85 is the generator's
+    treatment). Both arms share completion_prob, so the lift is the only
+    difference between them and lift 0 is the null for every stage. Returns
+    one row per grid point with the expected user-level rates and lift,
+    simulated power and its normal approximation.
+    """
+    k, k_weights = eligibility()
+    points = [(n, lift) for n in sample_sizes for lift in lifts]
+    seeds = np.random.SeedSequence(seed).spawn(len(points))
+    args = []
+    for (n, lift), point_seed in zip(points, seeds):
+        cell_probs = (cell_stage_prob(engagement_prob, completion_prob, stage),
+                      cell_stage_prob(min(engagement_prob * (1 + lift), 1.0), completion_prob, stage))
+        args.append((n, cell_probs, k, k_weights, replicates, alpha, point_seed))
+
+    workers = workers or min(len(args), os.cpu_count() or 1)
+    if workers <= 1:
+        simulated = [_simulate_point(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            simulated = list(pool.map(_simulate_point, *zip(*args)))
+
+    rows = []
+    for (n, lift), a, sim in zip(points, args, simulated):
+        p1, p2 = (float(k_weights @ user_success_prob(p, k)) for p in a[1])
+        n2 = n * VARIANT_PROBS[1]
+        rows.append({
+            'n_users': n,
+            'lift': lift,
+            'control_rate': p1,
+            'treatment_rate': p2,
+            'abs_lift': p2 - p1,
+            'rel_lift': (p2 - p1) / p1,
+            **sim,
+            'analytic_power': float(analytic_power(p1, p2, n - n2, n2, alpha)),
+        })
+    return pd.DataFrame(rows)
+
+
+def minimum_detectable_effect(grid, target=0.8, column='power'):
+    """
+    Smallest effect reaching the target power for every sample size, by
+    linear interpolation along the lift axis of a power_grid frame. Returns
+    one row per sample size with the lift and the user-level absolute and
+    relative lift at that point (NaN if the grid never reaches the target).
+    """
+    rows = []
+    for n, point in grid.sort_values('lift').groupby('n_users'):
+        power = point[column].to_numpy()
+        above = np.flatnonzero(power >= target)
+        row = {'n_users': n, 'lift': np.nan, 'abs_lift': np.nan, 'rel_lift': np.nan}
+        if above.size:
+            i = above[0]
+            j = max(i - 1, 0)
+            frac = 0.0 if i == j else (target - power[j]) / (power[i] - power[j])
+            for key in ('lift', 'abs_lift', 'rel_lift'):
+                values = point[key].to_numpy()
+                row[key] = values[j] + frac * (values[i] - values[j])
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,175 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Single-pass cohort retention engine
+
+Every timestamp is mapped to an integer period number (day, Monday-aligned
+week or calendar month), so the offset of an activity from its user's signup
+cohort is plain subtraction. Activity rows are joined to their user once, the
+distinct (user, offset) pairs are kept, and one bincount builds the whole
+cohort x variant x offset active-user matrix.
+"""
+
+import numpy as np
+import pandas as pd
+
+GRANULARITIES = {
+    'D': ('cohort_day', 'days_after'),
+    'W': ('cohort_week', 'weeks_after'),
+    'M': ('cohort_month', 'months_after'),
+}
+
+
+def period_number(timestamps, granularity='W'):
+    """Integer period index of datetime64 values (weeks start on Monday)."""
+    timestamps = np.asarray(timestamps)
+    if granularity == 'M':
+        return timestamps.astype('datetime64[M]').astype(np.int64)
+    days = timestamps.astype('datetime64[D]').astype(np.int64)
+    if granularity == 'D':
+        return days
+    if granularity == 'W':
+        # 1970-01-01 was a Thursday; shifting by 3 days puts week boundaries on Mondays
+        return (days + 3) // 7
+    raise ValueError(f'unknown granularity {granularity!r}; expected one of {list(GRANULARITIES)}')
+
+
+def period_start(periods, granularity='W'):
+    """First day of each period number, as datetime64[D]."""
+    periods = np.asarray(periods, dtype=np.int64)
+    if granularity == 'M':
+        return periods.astype('datetime64[M]').astype('datetime64[D]')
+    if granularity == 'W':
+        return (periods * 7 - 3).astype('datetime64[D]')
+    return periods.astype('datetime64[D]')
+
+
+def user_index(user_ids, activity_user_ids):
+    """
+    Position of every activity's user in user_ids, and a mask of the activity
+    rows whose user is known.
+    """
+    user_ids = np.asarray(user_ids)
+    activity_user_ids = np.asarray(activity_user_ids)
+    if len(user_ids) < 2 or np.all(user_ids[1:] > user_ids[:-1]):
+        # Users tables are normally already sorted by id; skip the argsort
+        order = np.arange(len(user_ids))
+    else:
+        order = np.argsort(user_ids, kind='stable')
+    sorted_ids = user_ids[order]
+    pos = np.searchsorted(sorted_ids, activity_user_ids)
+    pos[pos == len(sorted_ids)] = 0
+    valid = sorted_ids[pos] == activity_user_ids if len(sorted_ids) else np.zeros(len(pos), bool)
+    return order[pos[valid]], valid
+
+
+def retention_counts(users, user_activity, granularity='W', horizon=16, group_col='variant_group'):
+    """
+    Active-user counts for every cohort x group x offset cell.
+
+    Returns a dict with
+        cohorts: period number of each cohort
+        groups:  group labels
+        sizes:   (cohorts, groups) users per cell
+        active:  (cohorts, groups, horizon) distinct users active at each offset
+    """
+    signup_period = period_number(users['signup_date'].to_numpy(), granularity)
+    group = pd.Categorical(users[group_col])
+    group_codes = group.codes.astype(np.int64)
+    cohorts, cohort_idx = np.unique(signup_period, return_inverse=True)
+    n_cohorts, n_groups = len(cohorts), len(group.categories)
+
+    uidx, valid = user_index(users['user_id'].to_numpy(), user_activity['user_id'].to_numpy())
+    offset = period_number(user_activity['activity_timestamp'].to_numpy()[valid], granularity) - signup_period[uidx]
+    keep = (offset >= 0) & (offset < horizon)
+
+    # Users without a group (NaN group_col) are left out, as in funnel_counts
+    known = group_codes >= 0
+    keep &= known[uidx]
+
+    # Distinct (user, offset) pairs, then one bincount over the flattened cells
+    pairs = np.unique(uidx[keep].astype(np.int64) * horizon + offset[keep])
+    pair_user, pair_offset = np.divmod(pairs, horizon)
+    cell = (cohort_idx[pair_user] * n_groups + group_codes[pair_user]) * horizon + pair_offset
+    active = np.bincount(cell, minlength=n_cohorts * n_groups * horizon).reshape(n_cohorts, n_groups, horizon)
+    sizes = np.bincount((cohort_idx * n_groups + group_codes)[known],
+                        minlength=n_cohorts * n_groups).reshape(n_cohorts, n_groups)
+    return {
+        'granularity': granularity,
+        'cohorts': cohorts,
+        'groups': list(group.categories),
+        'sizes': sizes,
+        'active': active,
+    }
+
+
+def active_offsets(users, user_activity, granularity='W', horizon=16, bits=None):
+    """
+    Per-user bitset of the offsets (bit k = k periods after signup) at which
+    the user was active, aligned with the rows of users. Bitsets are mergeable
+    with |, which is what the incremental mode relies on.
+    Pass bits to fold more activity into an existing bitset in place.
+    """
+    if horizon > 64:
+        raise ValueError('offset bitsets hold at most 64 periods')
+    signup_period = period_number(users['signup_date'].to_numpy(), granularity)
+    if bits is None:
+        bits = np.zeros(len(users), dtype=np.uint64)
+    uidx, valid = user_index(users['user_id'].to_numpy(), user_activity['user_id'].to_numpy())
+    offset = period_number(user_activity['activity_timestamp'].to_numpy()[valid], granularity) - signup_period[uidx]
+    keep = (offset >= 0) & (offset < horizon)
+    np.bitwise_or.at(bits, uidx[keep], np.left_shift(np.uint64(1), offset[keep].astype(np.uint64)))
+    return bits
+
+
+def counts_from_offsets(users, bits, granularity='W', horizon=16, group_col='variant_group'):
+    """Same result as retention_counts, built from per-user offset bitsets."""
+    signup_period = period_number(users['signup_date'].to_numpy(), granularity)
+    group = pd.Categorical(users[group_col])
+    group_codes = group.codes.astype(np.int64)
+    cohorts, cohort_idx = np.unique(signup_period, return_inverse=True)
+    n_cohorts, n_groups = len(cohorts), len(group.categories)
+
+    # Users without a group (NaN group_col) are left out, as in funnel_counts
+    known = group_codes >= 0
+    cell = (cohort_idx * n_groups + group_codes)[known]
+    bits = np.asarray(bits)[known]
+    active = np.empty((n_cohorts * n_groups, horizon), dtype=np.int64)
+    for k in range(horizon):
+        hit = (bits >> np.uint64(k)) & np.uint64(1)
+        active[:, k] = np.bincount(cell, weights=hit, minlength=n_cohorts * n_groups)
+    return {
+        'granularity': granularity,
+        'cohorts': cohorts,
+        'groups': list(group.categories),
+        'sizes': np.bincount(cell, minlength=n_cohorts * n_groups).reshape(n_cohorts, n_groups),
+        'active': active.reshape(n_cohorts, n_groups, horizon),
+    }
+
+
+def retention_frame(counts):
+    """Tidy cohort table: one row per non-empty cohort x group and offset."""
+    cohort_col, offset_col = GRANULARITIES[counts['granularity']]
+    sizes, active = counts['sizes'], counts['active']
+    horizon = active.shape[2]
+    c, g = np.nonzero(sizes)
+    size = np.repeat(sizes[c, g], horizon)
+    active_users = active[c, g].ravel()
+    return pd.DataFrame({
+        cohort_col: np.repeat(pd.to_datetime(period_start(counts['cohorts'], counts['granularity'])[c]), horizon),
+        'variant': np.repeat(np.asarray(counts['groups'], dtype=object)[g], horizon),
+        offset_col: np.tile(np.arange(horizon), len(c)),
+        'cohort_size': size,
+        'active_users': active_users,
+        'retention_rate': active_users / size * 100,
+    })
+
+
+def cohort_retention(users, user_activity, granularity='W', horizon=16, group_col='variant_group'):
+    """Cohort retention table in one grouped pass over the activity log."""
+    return retention_frame(retention_counts(users, user_activity, granularity, horizon, group_col))
+
+
+def average_retention(cohort_df):
+    """Unweighted mean retention rate across cohorts, by group and offset."""
+    offset_col = next(col for _, col in GRANULARITIES.values() if col in cohort_df)
+    return cohort_df.groupby(['variant', offset_col])['retention_rate'].mean().reset_index()
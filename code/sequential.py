@@ -0,0 +1,209 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Sequential monitoring with always-valid p-values over streaming activity
+
+The fixed-horizon z-test is only valid when it is run once, at the end of
+the test; checking it every day and stopping at the first p < 0.05 inflates
+the false positive rate many times over. The monitor instead consumes the
+activity log in time order and, after every step, reports a mixture SPRT
+(significance.mixture_sprt) for each metric stage and each arm against
+arms[0]: an always-valid p-value (the running minimum of 1 / likelihood
+ratio) and a confidence sequence for the lift (the running intersection of
+the intervals). Both may be checked after every step and acted on at any
+time, so an experiment can stop as soon as its p-value drops below alpha.
+
+A user's outcome for a metric is whether they reached its stage within
+window_days of their signup_date, and they enter the sample once that window
+has closed. Every user is then one observation with a fixed outcome, which
+the mSPRT needs; "reached the stage so far" keeps changing while users age,
+so its lift drifts over the test and no confidence sequence can track it.
+The monitor keeps one stage bitmask per user and per-arm counts, so a step
+costs O(new events + newly matured users), whatever the length of the
+history:
+
+    monitor = new_monitor(users, metrics=['signup', 'complete_interview'])
+    update(monitor, todays_activity, until='2025-09-02')   # one row per metric x arm
+    ...
+
+or replay a stored log day by day with replay(users, user_activity).
+"""
+
+import numpy as np
+import pandas as pd
+
+from funnel import stage_codes
+from generator import FUNNEL_STAGES
+from retention import GRANULARITIES, period_number, period_start
+from significance import adjust_pvalues, mixture_sprt, two_proportion_ztest
+
+DEFAULT_METRICS = ['signup', 'complete_interview']
+DEFAULT_TAU = 0.05  # mixture standard deviation, on the scale of the lift in rate
+DEFAULT_WINDOW_DAYS = 28
+DAY = 86400
+
+
+def new_monitor(users, metrics=DEFAULT_METRICS, arms=None, group_col='variant_group', tau=DEFAULT_TAU,
+                alpha=0.05, window_days=DEFAULT_WINDOW_DAYS, stages=FUNNEL_STAGES):
+    """
+    Empty monitor over the rows of users. metrics are funnel stages, arms
+    the group labels to compare (arms[0] is the control; default: all
+    groups) and window_days the outcome window after signup. Raises
+    ValueError for unknown metrics or arms.
+    """
+    bad = [m for m in metrics if m not in stages]
+    if bad:
+        raise ValueError(f'metrics {bad} are not funnel stages {list(stages)}')
+    if len(metrics) > 8:
+        raise ValueError('at most 8 metrics fit the per-user stage bitmask')
+    group = pd.Categorical(users[group_col])
+    arms = list(arms or group.categories)
+    if len(arms) < 2 or any(a not in group.categories for a in arms):
+        raise ValueError(f'arms must be at least two of {list(group.categories)}')
+    lookup = np.array([arms.index(c) if c in arms else -1 for c in group.categories] + [-1], dtype=np.int16)
+
+    # Per-user arrays are kept in user_id order, so new events find their user by binary search
+    user_ids = users['user_id'].to_numpy()
+    order = np.argsort(user_ids, kind='stable')
+    signup = users['signup_date'].to_numpy().astype('datetime64[s]').astype(np.int64)[order]
+    mature_order = np.argsort(signup, kind='stable')
+    return {
+        'metrics': list(metrics),
+        'arms': arms,
+        'tau': tau,
+        'alpha': alpha,
+        'window': window_days * DAY,
+        'user_id': user_ids[order],
+        'arm': lookup[group.codes[order]],
+        'signup': signup,
+        'mature_order': mature_order,
+        'mature_at': signup[mature_order] + window_days * DAY,
+        'matured': 0,
+        'reached': np.zeros(len(users), dtype=np.uint8),
+        'users': np.zeros(len(arms), dtype=np.int64),
+        'successes': np.zeros((len(arms), len(metrics)), dtype=np.int64),
+        'p_value': np.ones((len(arms) - 1, len(metrics))),
+        'cs_low': np.full((len(arms) - 1, len(metrics)), -np.inf),
+        'cs_high': np.full((len(arms) - 1, len(metrics)), np.inf),
+        'events': 0,
+        'steps': 0,
+    }
+
+
+def fold(monitor, chunk):
+    """
+    Fold new activity rows into the per-user stage bitmasks. Rows of unknown
+    users, non-metric activity and activity outside the user's window are
+    skipped.
+    """
+    ids = chunk['user_id'].to_numpy()
+    sorted_ids = monitor['user_id']
+    pos = np.searchsorted(sorted_ids, ids)
+    pos[pos == len(sorted_ids)] = 0
+    metric = stage_codes(chunk['activity_type'], monitor['metrics'])
+    keep = (sorted_ids[pos] == ids) & (metric >= 0) if len(sorted_ids) else np.zeros(len(ids), bool)
+    pos, metric = pos[keep], metric[keep]
+    seconds = chunk['activity_timestamp'].to_numpy()[keep].astype('datetime64[s]').astype(np.int64)
+    within = seconds - monitor['signup'][pos] < monitor['window']
+    np.bitwise_or.at(monitor['reached'], pos[within], np.left_shift(np.uint8(1), metric[within].astype(np.uint8)))
+    monitor['events'] += len(chunk)
+
+
+def mature(monitor, until):
+    """Add the users whose outcome window closed by until to the per-arm counts."""
+    stop = np.searchsorted(monitor['mature_at'], np.datetime64(until, 's').astype(np.int64), side='right')
+    pos = monitor['mature_order'][monitor['matured']:stop]
+    monitor['matured'] = max(monitor['matured'], stop)
+    arm, reached = monitor['arm'][pos], monitor['reached'][pos]
+    arm, reached = arm[arm >= 0], reached[arm >= 0]
+    monitor['users'] += np.bincount(arm, minlength=len(monitor['arms']))
+    for m in range(len(monitor['metrics'])):
+        monitor['successes'][:, m] += np.bincount(arm[(reached >> m) & 1 == 1], minlength=len(monitor['arms']))
+
+
+def update(monitor, chunk, until):
+    """
+    One monitoring step: fold in chunk (the activity since the previous
+    step, all of it before until), count the users whose window closed by
+    until and update the always-valid statistics. Returns a frame with one
+    row per metric x arm.
+    """
+    until = np.datetime64(until, 's')
+    fold(monitor, chunk)
+    mature(monitor, until)
+    monitor['steps'] += 1
+
+    n, x = monitor['users'], monitor['successes']
+    n1, n2 = n[0], n[1:, None]
+    result = mixture_sprt(x[0], n1, x[1:], n2, monitor['tau'], monitor['alpha'])
+    fixed = two_proportion_ztest(x[0], n1, x[1:], n2, monitor['alpha'])
+    monitor['p_value'] = np.minimum(monitor['p_value'], result['p_value'])
+    monitor['cs_low'] = np.fmax(monitor['cs_low'], result['cs_low'])
+    monitor['cs_high'] = np.fmin(monitor['cs_high'], result['cs_high'])
+
+    shape = monitor['p_value'].shape
+    frame = pd.DataFrame({
+        'until': until,
+        'metric': np.tile(monitor['metrics'], shape[0]),
+        'control': monitor['arms'][0],
+        'arm': np.repeat(monitor['arms'][1:], shape[1]),
+        'control_users': n1,
+        'arm_users': np.repeat(n[1:], shape[1]),
+        'control_rate': np.tile(x[0] / max(n1, 1), shape[0]),
+        'arm_rate': (x[1:] / np.maximum(n2, 1)).ravel(),
+        'abs_lift': result['abs_lift'].ravel(),
+        'p_value': monitor['p_value'].ravel(),
+        'cs_low': monitor['cs_low'].ravel(),
+        'cs_high': monitor['cs_high'].ravel(),
+        'fixed_p_value': fixed['p_value'].ravel(),
+        'events': monitor['events'],
+    })
+    # Always-valid p-values stay valid at any stopping time, so Holm applies as usual
+    frame['p_adjusted'] = adjust_pvalues(frame['p_value'], 'holm')
+    frame['significant'] = frame['p_adjusted'] < monitor['alpha']
+    return frame
+
+
+def replay(users, user_activity, granularity='D', **options):
+    """
+    Run a monitor over a stored activity log one period (day or week) at a
+    time, as if it had arrived live. options go to new_monitor. Returns the
+    concatenated per-step frames.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'unknown granularity {granularity!r}; expected one of {list(GRANULARITIES)}')
+    monitor = new_monitor(users, **options)
+    periods = period_number(user_activity['activity_timestamp'].to_numpy(), granularity)
+    order = np.argsort(periods, kind='stable')
+    periods = periods[order]
+    # Run until the last user's window has closed
+    signup = users['signup_date'].to_numpy().astype('datetime64[s]')
+    first = period_number(signup.min(), granularity)
+    last = period_number(signup.max() + np.timedelta64(monitor['window'] - 1, 's'), granularity)
+    if len(periods):
+        first, last = min(first, periods[0]), max(last, periods[-1])
+    bounds = np.searchsorted(periods, np.arange(first, last + 2))
+    steps = []
+    for i, period in enumerate(range(first, last + 1)):
+        chunk = user_activity.iloc[order[bounds[i]:bounds[i + 1]]]
+        steps.append(update(monitor, chunk, period_start(period + 1, granularity)))
+    return pd.concat(steps, ignore_index=True)
+
+
+def stopping_points(history, alpha=0.05):
+    """
+    First step at which each metric x arm became significant (Holm-adjusted
+    always-valid p-value below alpha), with the share of the log read by
+    then. Rows that never became significant have a missing until.
+    """
+    total = history['events'].max()
+    keys = ['metric', 'arm']
+    crossed = history[history['p_adjusted'] < alpha].groupby(keys, sort=False).first()
+    final = history.groupby(keys, sort=False).last()
+    out = pd.DataFrame({
+        'until': crossed['until'].reindex(final.index),
+        'events_read': crossed['events'].reindex(final.index) / max(total, 1),
+        'lift_at_stop': crossed['abs_lift'].reindex(final.index),
+        'final_lift': final['abs_lift'],
+        'final_fixed_p_value': final['fixed_p_value'],
+    })
+    return out.reset_index()
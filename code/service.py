@@ -0,0 +1,364 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Local metrics query service with the experiment data kept hot in memory
+
+The data is loaded once and reduced to per-user (and per user x competition)
+funnel states and activity bitsets; every query then filters those arrays
+and aggregates them, which takes milliseconds instead of a cold run of
+02_analysis.py. Requests are served concurrently on threads, and POST
+/reload swaps in a freshly built state when new data lands while queries
+keep being answered from the old one.
+
+    python code/service.py --data-dir data --port 8050
+
+    GET  /status
+    GET  /engagement?segment=student&signup_week=2025-09-01
+    GET  /funnel?competition_id=12&ordered=1&window_hours=72
+    GET  /retention?weeks=4,6&segment=professional
+    GET  /test?metric=week_6&segment=student       (metric: a funnel stage or week_<k>)
+    POST /reload
+
+Every query accepts the user filters segment and signup_week (comma-separated
+values, weeks by their Monday). /funnel also takes competition_id or
+competition_type, in which case the units are user x competition pairs and
+the first stage's rate is relative to the eligible pairs, those of users
+who had signed up by the competition date (unit: user_competition). Results
+are JSON; repeated queries against the same state are answered from a
+per-state result cache. Invalid parameters are a 400 and any other failure
+a 500, both with an error message; a reload that fails keeps the old state.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import pandas as pd
+
+from funnel import funnel_counts, funnel_rates, funnel_state
+from generator import FUNNEL_STAGES
+from retention import (active_offsets, average_retention, counts_from_offsets, period_number, period_start,
+                       retention_frame, user_index)
+from significance import two_proportion_ztest
+from storage import load_table
+
+MAX_WEEKS = 64  # weeks held by the activity bitsets
+MAX_CACHED = 1024  # query results kept per state
+ARMS = ('control', 'treatment')
+ACTIVITY_COLUMNS = ['user_id', 'competition_id', 'activity_timestamp', 'activity_type']
+
+
+def load_state(data_dir, fmt='auto'):
+    """Load the tables and precompute everything queries read."""
+    started = time.perf_counter()
+    users = load_table(data_dir, 'users', fmt=fmt)
+    competitions = load_table(data_dir, 'competitions', fmt=fmt)
+    user_activity = load_table(data_dir, 'user_activity', ACTIVITY_COLUMNS, fmt=fmt)
+    competitions = competitions.set_index('competition_id')
+    return {
+        'data_dir': data_dir,
+        'format': fmt,
+        'users': users,
+        'segment': pd.Categorical(users['user_segment']),
+        'signup_week': period_number(users['signup_date'].to_numpy(), 'W'),
+        'funnel': funnel_state(users, user_activity, FUNNEL_STAGES),
+        'competition_funnel': funnel_state(users, user_activity, FUNNEL_STAGES, by_competition=True),
+        'competition_types': competitions['competition_type'],
+        'competition_dates': competitions['competition_date'].to_numpy().astype('datetime64[D]'),
+        'active_bits': active_offsets(users, user_activity, 'W', MAX_WEEKS),
+        'activity_rows': len(user_activity),
+        'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'load_seconds': time.perf_counter() - started,
+        'results': {},
+    }
+
+
+def _values(params, name, cast=str):
+    raw = params.get(name)
+    if not raw:
+        return None
+    try:
+        return [cast(v) for item in raw for v in item.split(',') if v]
+    except ValueError:
+        raise ValueError(f'invalid {name}: {raw}') from None
+
+
+def user_filter(state, params):
+    """Boolean mask of the users matching the segment and signup_week filters."""
+    keep = np.ones(len(state['users']), dtype=bool)
+    segments = _values(params, 'segment')
+    if segments:
+        unknown = set(segments) - set(state['segment'].categories)
+        if unknown:
+            raise ValueError(f'unknown segment {sorted(unknown)}; expected {list(state["segment"].categories)}')
+        keep &= np.isin(state['segment'], segments)
+    weeks = _values(params, 'signup_week', np.datetime64)
+    if weeks:
+        keep &= np.isin(state['signup_week'], period_number(np.array(weeks, dtype='datetime64[D]'), 'W'))
+    return keep
+
+
+def _sub_state(funnel, rows, group_sizes):
+    return {**funnel, 'group_codes': funnel['group_codes'][rows], 'mask': funnel['mask'][rows],
+            'first_seen': funnel['first_seen'][rows], 'group_sizes': group_sizes}
+
+
+def _group_sizes(funnel, rows):
+    """Units (users, or user x competition pairs) per group among the selected rows."""
+    codes = funnel['group_codes'][rows]
+    return np.bincount(codes[codes >= 0], minlength=len(funnel['groups']))
+
+
+def _eligible_pairs(state, keep, comp_ids):
+    """User x competition pairs per group among the kept users who had signed up by each competition's date."""
+    signup = state['users']['signup_date'].to_numpy().astype('datetime64[D]')[keep]
+    codes = state['funnel']['group_codes'][keep]
+    dates = state['competition_dates'][state['competition_types'].index.get_indexer(comp_ids)]
+    eligible = (signup[:, None] <= dates[None, :]).sum(axis=1)
+    known = codes >= 0
+    return np.bincount(codes[known], weights=eligible[known], minlength=len(state['funnel']['groups'])).astype(np.int64)
+
+
+def _test(state, successes, users):
+    """Z-test of treatment against control from per-group counts."""
+    groups = state['funnel']['groups']
+    c, t = groups.index(ARMS[0]), groups.index(ARMS[1])
+    result = two_proportion_ztest(successes[c], users[c], successes[t], users[t])
+    return {key: float(value) for key, value in result.items()}
+
+
+def engagement_query(state, params):
+    """Users reaching a stage (default signup) per variant, with the z-test."""
+    stage = (_values(params, 'stage') or ['signup'])[0]
+    if stage not in FUNNEL_STAGES:
+        raise ValueError(f'unknown stage {stage!r}; expected one of {FUNNEL_STAGES}')
+    keep = user_filter(state, params)
+    funnel_df = funnel_counts(_sub_state(state['funnel'], keep, _group_sizes(state['funnel'], keep)))
+    return {
+        'stage': stage,
+        'groups': {row['variant']: {'users': int(row['users']), 'engaged_users': int(row[stage]),
+                                    'engagement_rate': row[stage] / row['users'] * 100 if row['users'] else None}
+                   for _, row in funnel_df.iterrows()},
+        'test': _test(state, funnel_df[stage].to_numpy(), funnel_df['users'].to_numpy()),
+    }
+
+
+def funnel_query(state, params):
+    """
+    Stage counts and step rates per variant. With competition_id or
+    competition_type, units are user x competition pairs of those
+    competitions, and the first stage's rate is relative to the eligible
+    pairs (users who had signed up by the competition date); ordered and
+    window_hours as in funnel.reached_stages.
+    """
+    keep = user_filter(state, params)
+    types = state['competition_types']
+    comp_ids = _values(params, 'competition_id', int)
+    if comp_ids:
+        unknown = set(comp_ids) - set(types.index)
+        if unknown:
+            raise ValueError(f'unknown competition_id {sorted(unknown)}; expected ids of the competitions table '
+                             f'({types.index.min()}..{types.index.max()})')
+    comp_types = _values(params, 'competition_type')
+    if comp_types:
+        unknown = set(comp_types) - set(types)
+        if unknown:
+            raise ValueError(f'unknown competition_type {sorted(unknown)}; expected {sorted(set(types))}')
+        comp_ids = (comp_ids or []) + types[types.isin(comp_types)].index.tolist()
+    if comp_ids:
+        comp_ids = sorted(set(comp_ids))
+        funnel = state['competition_funnel']
+        user_pos, _ = user_index(state['funnel']['user_id'], funnel['user_id'])
+        rows = keep[user_pos] & np.isin(funnel['competition_id'], comp_ids)
+        sizes = _eligible_pairs(state, keep, comp_ids)
+    else:
+        funnel, rows = state['funnel'], keep
+        sizes = _group_sizes(funnel, rows)
+    window = _values(params, 'window_hours', float)
+    ordered = (_values(params, 'ordered') or ['0'])[0].lower() in ('1', 'true', 'yes')
+    funnel_df = funnel_rates(funnel_counts(_sub_state(funnel, rows, sizes), ordered,
+                                           window[0] if window else None), FUNNEL_STAGES)
+    return {
+        'competition_id': comp_ids,
+        'unit': 'user_competition' if comp_ids else 'user',
+        'ordered': ordered,
+        'window_hours': window[0] if window else None,
+        'groups': {row['variant']: {'units': int(row['users']),
+                                    'stages': {s: {'count': int(row[s]), 'rate': row[f'{s}_rate']}
+                                               for s in FUNNEL_STAGES}}
+                   for _, row in funnel_df.iterrows()},
+    }
+
+
+def _check_weeks(weeks):
+    if min(weeks) < 0 or max(weeks) >= MAX_WEEKS:
+        raise ValueError(f'weeks must be within 0..{MAX_WEEKS - 1}')
+    return weeks
+
+
+def retention_query(state, params):
+    """Average weekly retention across signup cohorts per variant (as in 02_analysis.py)."""
+    weeks = _check_weeks(_values(params, 'weeks', int) or list(range(16)))
+    keep = user_filter(state, params)
+    counts = counts_from_offsets(state['users'][keep], state['active_bits'][keep], 'W', max(weeks) + 1)
+    avg = average_retention(retention_frame(counts)).pivot(index='weeks_after', columns='variant',
+                                                           values='retention_rate')
+    return {
+        'cohorts': [str(d) for d in period_start(counts['cohorts'], 'W')],
+        'groups': {group: {str(w): avg.loc[w, group] for w in weeks} for group in avg.columns},
+    }
+
+
+def test_query(state, params):
+    """
+    Z-test of treatment against control on one user-level metric: reaching
+    a funnel stage, or being active k weeks after signup (week_<k>).
+    """
+    metric = (_values(params, 'metric') or ['signup'])[0]
+    keep = user_filter(state, params)
+    if metric in FUNNEL_STAGES:
+        success = (state['funnel']['mask'] >> FUNNEL_STAGES.index(metric)) & 1
+    elif metric.startswith('week_'):
+        week = _check_weeks(_values({'metric': [metric[5:]]}, 'metric', int) or [-1])[0]
+        success = (state['active_bits'] >> np.uint64(week)) & np.uint64(1)
+    else:
+        raise ValueError(f'unknown metric {metric!r}; expected a funnel stage or week_<k>')
+    codes = state['funnel']['group_codes'][keep]
+    known = codes >= 0
+    n_groups = len(state['funnel']['groups'])
+    successes = np.bincount(codes[known], weights=success[keep][known].astype(float), minlength=n_groups)
+    users = np.bincount(codes[known], minlength=n_groups)
+    return {'metric': metric, 'users': dict(zip(state['funnel']['groups'], users.tolist())),
+            'successes': dict(zip(state['funnel']['groups'], successes.astype(int).tolist())),
+            'test': _test(state, successes, users)}
+
+
+def status(state):
+    funnel = state['funnel']
+    return {
+        'data_dir': state['data_dir'],
+        'loaded_at': state['loaded_at'],
+        'load_seconds': state['load_seconds'],
+        'users': len(state['users']),
+        'groups': dict(zip(funnel['groups'], funnel['group_sizes'].tolist())),
+        'activity_rows': state['activity_rows'],
+        'cached_results': len(state['results']),
+    }
+
+
+QUERIES = {
+    '/engagement': engagement_query,
+    '/funnel': funnel_query,
+    '/retention': retention_query,
+    '/test': test_query,
+}
+
+
+def _json_safe(value):
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def query(service, path, params):
+    """Answer one GET request from the current state. Returns (status code, payload)."""
+    state = service['state']  # one reference per request; a reload swaps in a new dict
+    if path == '/status':
+        return 200, status(state)
+    if path not in QUERIES:
+        return 404, {'error': f'unknown endpoint {path}', 'endpoints': ['/status', *QUERIES, '/reload']}
+    key = (path, tuple(sorted((k, tuple(v)) for k, v in params.items())))
+    result = state['results'].get(key)
+    if result is None:
+        try:
+            result = _json_safe(QUERIES[path](state, params))
+        except ValueError as error:
+            return 400, {'error': str(error)}
+        except Exception as error:
+            return 500, {'error': f'{type(error).__name__}: {error}'}
+        if len(state['results']) >= MAX_CACHED:
+            state['results'].pop(next(iter(state['results'])), None)
+        state['results'][key] = result
+    return 200, result
+
+
+def reload(service):
+    """
+    Rebuild the state from the data directory and swap it in; one reload at
+    a time. Returns (status code, payload); if the rebuild fails the old
+    state keeps serving.
+    """
+    with service['reload_lock']:
+        old = service['state']
+        try:
+            service['state'] = load_state(old['data_dir'], old['format'])
+        except Exception as error:
+            return 500, {'error': f'reload failed, still serving the previous data: {type(error).__name__}: {error}'}
+    return 200, status(service['state'])
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, payload, started):
+            payload = {**payload, 'elapsed_ms': (time.perf_counter() - started) * 1000}
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            started = time.perf_counter()
+            url = urlparse(self.path)
+            self._send(*query(service, url.path, parse_qs(url.query)), started)
+
+        def do_POST(self):
+            started = time.perf_counter()
+            if urlparse(self.path).path != '/reload':
+                self._send(404, {'error': 'POST only supports /reload'}, started)
+                return
+            self._send(*reload(service), started)
+
+        def log_message(self, format, *args):
+            if not service['quiet']:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def serve(data_dir, host='127.0.0.1', port=8050, fmt='auto', quiet=False):
+    """Load the data and serve queries until interrupted. Returns the server (after shutdown)."""
+    service = {'state': load_state(data_dir, fmt), 'reload_lock': threading.Lock(), 'quiet': quiet}
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    info = status(service['state'])
+    print(f"  ✓ Loaded {info['users']:,} users and {info['activity_rows']:,} activities "
+          f"in {info['load_seconds']:.2f}s")
+    print(f"  Serving on http://{host}:{server.server_address[1]}/ (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve engagement/funnel/retention/test queries over HTTP')
+    parser.add_argument('--data-dir', default='/home/ubuntu/interview_prep/project_1_wekruit/data')
+    parser.add_argument('--format', choices=['auto', 'csv', 'npy'], default='auto')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--quiet', action='store_true', help="don't log every request")
+    args = parser.parse_args()
+    serve(args.data_dir, args.host, args.port, args.format, args.quiet)
@@ -0,0 +1,102 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Vectorized significance tests
+
+Every function takes arrays, so one call tests any number of comparisons.
+"""
+
+import numpy as np
+from scipy.stats import norm
+
+
+def two_proportion_ztest(x1, n1, x2, n2, alpha=0.05):
+    """
+    Pooled two-proportion z-test of group 2 against group 1.
+
+    Returns a dict of arrays: p1, p2, abs_lift (p2 - p1), rel_lift
+    ((p2 - p1) / p1), z, p_value (two-sided), and ci_low/ci_high, the
+    unpooled Wald interval for p2 - p1 at 1 - alpha.
+    """
+    x1, n1, x2, n2 = (np.asarray(a, dtype=float) for a in (x1, n1, x2, n2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p1, p2 = x1 / n1, x2 / n2
+        p_pool = (x1 + x2) / (n1 + n2)
+        se = np.sqrt(p_pool * (1 - p_pool) * (1 / n1 + 1 / n2))
+        z = (p2 - p1) / se
+        se_diff = np.sqrt(p1 * (1 - p1) / n1 + p2 * (1 - p2) / n2)
+        rel_lift = (p2 - p1) / p1
+    margin = norm.ppf(1 - alpha / 2) * se_diff
+    return {
+        'p1': p1,
+        'p2': p2,
+        'abs_lift': p2 - p1,
+        'rel_lift': rel_lift,
+        'z': z,
+        'p_value': 2 * norm.sf(np.abs(z)),
+        'ci_low': p2 - p1 - margin,
+        'ci_high': p2 - p1 + margin,
+    }
+
+
+def mixture_sprt(x1, n1, x2, n2, tau=0.05, alpha=0.05):
+    """
+    Mixture sequential probability ratio test (mSPRT) of group 2 against
+    group 1, with a N(0, tau^2) mixture over the difference p2 - p1 and the
+    normal approximation of the z-test.
+
+    Returns a dict of arrays: abs_lift, likelihood_ratio, p_value (1 / ratio,
+    capped at 1) and cs_low/cs_high, the 1 - alpha confidence sequence for
+    p2 - p1. Unlike the z-test these stay valid however often they are
+    checked, but only as running values: take the running minimum of
+    p_value and the running intersection of the interval across looks.
+    """
+    x1, n1, x2, n2 = (np.asarray(a, dtype=float) for a in (x1, n1, x2, n2))
+    tau2 = tau ** 2
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        p1, p2 = x1 / n1, x2 / n2
+        diff = p2 - p1
+        p_pool = (x1 + x2) / (n1 + n2)
+        v = p_pool * (1 - p_pool) * (1 / n1 + 1 / n2)
+        ratio = np.sqrt(v / (v + tau2)) * np.exp(diff ** 2 * tau2 / (2 * v * (v + tau2)))
+        ratio = np.where(np.isnan(ratio), 1.0, ratio)  # no variance yet: no evidence either way
+        v_diff = p1 * (1 - p1) / n1 + p2 * (1 - p2) / n2
+        margin = np.sqrt(v_diff * (v_diff + tau2) / tau2 * (np.log((v_diff + tau2) / v_diff) - 2 * np.log(alpha)))
+    return {
+        'abs_lift': diff,
+        'likelihood_ratio': ratio,
+        'p_value': np.minimum(1 / ratio, 1),
+        'cs_low': diff - margin,
+        'cs_high': diff + margin,
+    }
+
+
+def adjust_pvalues(p_values, method='fdr_bh'):
+    """
+    Multiple-testing adjusted p-values. method is 'fdr_bh'
+    (Benjamini-Hochberg), 'holm' or 'bonferroni'. NaNs are left out of the
+    family and stay NaN.
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = np.full(p_values.shape, np.nan)
+    finite = np.isfinite(p_values)
+    p = p_values[finite]
+    m = p.size
+    if m == 0:
+        return adjusted
+    order = np.argsort(p, kind='stable')
+    ranked = p[order]
+    rank = np.arange(1, m + 1)
+    if method == 'bonferroni':
+        out = np.minimum(p * m, 1)
+    elif method == 'holm':
+        stepped = np.minimum(np.maximum.accumulate((m - rank + 1) * ranked), 1)
+        out = np.empty(m)
+        out[order] = stepped
+    elif method == 'fdr_bh':
+        stepped = np.minimum(np.minimum.accumulate((ranked * m / rank)[::-1])[::-1], 1)
+        out = np.empty(m)
+        out[order] = stepped
+    else:
+        raise ValueError(f'unknown method {method!r}')
+    adjusted[finite] = out
+    return adjusted
@@ -0,0 +1,119 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Batched segment slicing: lift and z-tests for every dimension combination
+
+Slices are every combination of user_segment x competition_type x signup
+cohort, where each dimension can also be 'all'. A user counts as a success in
+a competition_type slice if they reached the metric stage (signup by default,
+i.e. engagement) in a competition of that type.
+
+All contingency counts come from one grouped pass over the users: a
+per-user bitmask of the competition types each stage was reached in (built
+by fold_type_bits, from the log or a streaming accumulator) is bincounted
+into a segment x cohort x type x arm cube, the 'all' levels are sums over
+its axes, and the z-tests run as one vectorized call over every cell.
+"""
+
+import itertools
+import numpy as np
+import pandas as pd
+
+from funnel import funnel_rows
+from generator import FUNNEL_STAGES
+from retention import period_number, period_start, user_index
+from significance import adjust_pvalues, two_proportion_ztest
+
+ALL = 'all'
+DIMENSIONS = ['user_segment', 'competition_type', 'signup_cohort']
+
+
+def empty_type_bits(n_users, n_stages, n_types):
+    if n_types > 32:
+        raise ValueError('type bitmasks hold at most 32 competition types')
+    return np.zeros((n_users, n_stages), dtype=np.uint8 if n_types <= 8 else np.uint32)
+
+
+def fold_type_bits(users, user_activity, competitions, stages=FUNNEL_STAGES, bits=None):
+    """
+    (users, stages) bitmask of the competition types (bit t is the t-th
+    competition_type category) each user reached each stage in, aligned with
+    the rows of users. Pass bits to fold more activity into it in place.
+    """
+    comp_type = pd.Categorical(competitions['competition_type'])
+    if bits is None:
+        bits = empty_type_bits(len(users), len(stages), len(comp_type.categories))
+    uidx, stage, _, rows = funnel_rows(users['user_id'].to_numpy(), user_activity, stages)
+    cidx, known = user_index(competitions['competition_id'].to_numpy(),
+                             user_activity['competition_id'].to_numpy()[rows])
+    type_code = comp_type.codes[cidx]
+    cell = (uidx[known] * len(stages) + stage[known])
+    np.bitwise_or.at(bits.reshape(-1), cell, (1 << type_code.astype(np.int64)).astype(bits.dtype))
+    return bits
+
+
+def _with_all(array, axis):
+    """Append the sum over axis as an extra trailing 'all' level."""
+    return np.concatenate([array, array.sum(axis=axis, keepdims=True)], axis=axis)
+
+
+def slice_counts(users, type_bits, competition_types, stage_index=0, arms=('control', 'treatment'),
+                 group_col='variant_group', granularity='W'):
+    """
+    Contingency counts for every slice. Returns (labels, n, x): labels maps
+    each dimension to its level names (the last one is 'all'), n and x are
+    (segments, types, cohorts, arms) arrays of users and successes.
+    """
+    segment = pd.Categorical(users['user_segment'])
+    cohorts, cohort_code = np.unique(period_number(users['signup_date'].to_numpy(), granularity),
+                                     return_inverse=True)
+    arm_code = pd.Categorical(users[group_col], categories=list(arms)).codes.astype(np.int64)
+    in_arms = arm_code >= 0
+
+    n_seg, n_coh, n_arm, n_type = len(segment.categories), len(cohorts), len(arms), len(competition_types)
+    key = ((segment.codes.astype(np.int64) * n_coh + cohort_code) * n_arm + arm_code)[in_arms]
+    size = n_seg * n_coh * n_arm
+    n = np.bincount(key, minlength=size).reshape(n_seg, 1, n_coh, n_arm)
+
+    stage_bits = type_bits[in_arms, stage_index].astype(np.int64)
+    x = np.empty((n_seg, n_type + 1, n_coh, n_arm), dtype=np.int64)
+    for t in range(n_type):
+        x[:, t] = np.bincount(key, weights=(stage_bits >> t) & 1, minlength=size).reshape(n_seg, n_coh, n_arm)
+    any_type = (stage_bits != 0).astype(float)
+    x[:, n_type] = np.bincount(key, weights=any_type, minlength=size).reshape(n_seg, n_coh, n_arm)
+
+    # 'all' levels for the user-level dimensions; the type dimension already has one
+    n = np.broadcast_to(n, x.shape)
+    n, x = _with_all(_with_all(n, 0), 2), _with_all(_with_all(x, 0), 2)
+    labels = {
+        'user_segment': list(segment.categories) + [ALL],
+        'competition_type': list(competition_types) + [ALL],
+        'signup_cohort': [str(d) for d in period_start(cohorts, granularity)] + [ALL],
+    }
+    return labels, n, x
+
+
+def slice_table(users, type_bits, competition_types, stage_index=0, arms=('control', 'treatment'),
+                group_col='variant_group', granularity='W', alpha=0.05, correction='fdr_bh'):
+    """
+    Tidy results for every slice: one row per dimension combination with both
+    arms' counts and rates, absolute and relative lift, z, p-value, the
+    confidence interval for the difference, and the multiple-testing
+    adjusted p-value.
+    """
+    labels, n, x = slice_counts(users, type_bits, competition_types, stage_index, arms, group_col, granularity)
+    cells = list(itertools.product(*(range(len(labels[d])) for d in DIMENSIONS)))
+    idx = tuple(np.array(axis) for axis in zip(*cells))
+    n1, n2 = n[idx + (0,)], n[idx + (1,)]
+    x1, x2 = x[idx + (0,)], x[idx + (1,)]
+    test = two_proportion_ztest(x1, n1, x2, n2, alpha)
+
+    table = pd.DataFrame({d: np.asarray(labels[d], dtype=object)[i] for d, i in zip(DIMENSIONS, idx)})
+    table[f'{arms[0]}_users'], table[f'{arms[0]}_successes'] = n1, x1
+    table[f'{arms[1]}_users'], table[f'{arms[1]}_successes'] = n2, x2
+    table[f'{arms[0]}_rate'], table[f'{arms[1]}_rate'] = test['p1'], test['p2']
+    for key in ('abs_lift', 'rel_lift', 'z', 'p_value', 'ci_low', 'ci_high'):
+        table[key] = test[key]
+    table['p_adjusted'] = adjust_pvalues(test['p_value'], correction)
+    table['significant'] = table['p_adjusted'] < alpha
+    table['dimensions'] = sum((table[d] != ALL).astype(int) for d in DIMENSIONS)
+    return table
@@ -0,0 +1,348 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Typed columnar storage for users, competitions and user_activity
+
+A table is a directory of parts, and every part is a directory holding one
+.npy file per column plus a meta.json with the categorical domains:
+
+    data/user_activity/part-00000/activity_id.npy
+                                 /user_id.npy
+                                 /activity_type.npy   (int8 codes)
+                                 /meta.json
+
+Columns are loaded with np.load(mmap_mode='r'), so a single-part table is
+read without copying and only the projected columns are ever touched. Ids
+are int32, categoricals are int8 codes and timestamps are datetime64[s].
+Tables with several parts (01_generate_data.py --format npy writes one per
+100k-user block) are concatenated into memory when loaded whole; only the
+single-part copies convert_csv writes are read without copying, and
+iter_table_chunks streams either kind.
+
+A columnar copy converted from CSV records the size and modification time
+of its source files; with fmt='auto' a copy whose CSV has changed since
+(e.g. rows appended to user_activity.csv) is ignored in favour of the CSV.
+Convert existing CSVs with:
+
+    python code/storage.py --data-dir data
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import warnings
+import numpy as np
+import pandas as pd
+
+from generator import COMPETITION_TYPES, FUNNEL_STAGES, USER_SEGMENTS, VARIANTS
+
+FORMATS = ['csv', 'npy']
+
+# column -> numpy dtype, or list of categories for categorical columns
+SCHEMAS = {
+    'users': {
+        'user_id': 'int32',
+        'signup_date': 'datetime64[s]',
+        'user_segment': USER_SEGMENTS,
+        'variant_group': VARIANTS,
+    },
+    'competitions': {
+        'competition_id': 'int32',
+        'competition_date': 'datetime64[s]',
+        'competition_type': COMPETITION_TYPES,
+    },
+    'user_activity': {
+        'activity_id': 'int64',
+        'user_id': 'int32',
+        'competition_id': 'int32',
+        'activity_timestamp': 'datetime64[s]',
+        'activity_type': FUNNEL_STAGES,
+        'session_duration': 'int32',
+    },
+}
+
+
+def table_dir(data_dir, table):
+    return os.path.join(data_dir, table)
+
+
+def has_columnar(data_dir, table):
+    return bool(list_parts(table_dir(data_dir, table)))
+
+
+def csv_stamp(data_dir, table):
+    """Size and modification time of a table's CSV files, as recorded in a converted copy's meta.json."""
+    return [{'file': os.path.basename(p), 'size': os.stat(p).st_size, 'mtime_ns': os.stat(p).st_mtime_ns}
+            for p in _csv_paths(data_dir, table) if os.path.exists(p)]
+
+
+def use_columnar(data_dir, table, fmt='auto'):
+    """
+    Whether a read with this fmt should use the columnar copy. With 'auto' a
+    copy converted from CSVs that have changed since is skipped, with a
+    warning, and the CSV is read instead.
+    """
+    if fmt != 'auto':
+        return fmt == 'npy'
+    parts = list_parts(table_dir(data_dir, table))
+    if not parts:
+        return False
+    with open(parts[0]) as f:
+        source = json.load(f).get('source')
+    if source is not None and source != csv_stamp(data_dir, table):
+        warnings.warn(f'columnar copy of {table} is older than its CSV; reading the CSV '
+                      '(re-run storage.py to convert it again)')
+        return False
+    return True
+
+
+def list_parts(path):
+    return sorted(glob.glob(os.path.join(path, 'part-*', 'meta.json')))
+
+
+def write_table(frame, path, table, part=0, source=None):
+    """
+    Write frame as one part of a columnar table, coercing it to the table
+    schema. source is the csv_stamp of the CSVs it was converted from.
+    """
+    part_dir = os.path.join(path, f'part-{part:05d}')
+    os.makedirs(part_dir, exist_ok=True)
+    meta = {'table': table, 'rows': len(frame), 'columns': {}}
+    if source is not None:
+        meta['source'] = source
+    for column, spec in SCHEMAS[table].items():
+        if column not in frame:
+            continue
+        values = frame[column]
+        if isinstance(spec, list):
+            categorical = pd.Categorical(values)
+            categories = list(spec) + [c for c in categorical.categories if c not in spec]
+            codes = pd.Categorical(values, categories=categories).codes
+            array = codes.astype(np.int8 if len(categories) < 128 else np.int16)
+            meta['columns'][column] = {'dtype': str(array.dtype), 'categories': categories}
+        else:
+            array = np.asarray(values.to_numpy(), dtype=spec)
+            meta['columns'][column] = {'dtype': spec}
+        np.save(os.path.join(part_dir, f'{column}.npy'), array)
+    with open(os.path.join(part_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+
+def _read_metas(path):
+    parts = list_parts(path)
+    if not parts:
+        raise FileNotFoundError(f'no columnar parts under {path}')
+    metas = []
+    for meta_path in parts:
+        with open(meta_path) as f:
+            metas.append(json.load(f))
+    return parts, metas
+
+
+def read_arrays(path, columns=None, mmap=True):
+    """
+    Load the raw column arrays of a columnar table.
+
+    Returns ({column: ndarray}, {column: categories}); categorical columns come
+    back as integer codes. With a single part the arrays are read-only memory
+    maps; several parts are concatenated into one in-memory copy per column.
+    """
+    parts, metas = _read_metas(path)
+    columns = list(metas[0]['columns']) if columns is None else list(columns)
+
+    arrays, categories = {}, {}
+    for column in columns:
+        chunks = []
+        cats = metas[0]['columns'][column].get('categories')
+        for meta_path, meta in zip(parts, metas):
+            array = np.load(os.path.join(os.path.dirname(meta_path), f'{column}.npy'),
+                            mmap_mode='r' if mmap else None)
+            part_cats = meta['columns'][column].get('categories')
+            if part_cats is not None and part_cats != cats:
+                # Remap this part's codes onto the running category list
+                cats = cats + [c for c in part_cats if c not in cats]
+                lookup = np.array([cats.index(c) for c in part_cats], dtype=np.int16)
+                array = np.where(array >= 0, lookup[array], -1)
+            chunks.append(array)
+        arrays[column] = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+        if cats is not None:
+            categories[column] = cats
+            code_dtype = np.int8 if len(cats) < 128 else np.int16
+            if arrays[column].dtype != code_dtype:
+                arrays[column] = arrays[column].astype(code_dtype)
+    return arrays, categories
+
+
+def _frame(arrays, categories):
+    data = {}
+    for column, array in arrays.items():
+        if column in categories:
+            data[column] = pd.Categorical.from_codes(array, categories[column])
+        else:
+            data[column] = array
+    return pd.DataFrame(data, copy=False)
+
+
+def read_table(path, columns=None, mmap=True):
+    """Load a columnar table as a DataFrame, projecting to columns."""
+    return _frame(*read_arrays(path, columns, mmap))
+
+
+def _csv_paths(data_dir, table):
+    paths = sorted(glob.glob(os.path.join(data_dir, f'{table}.part-*.csv')))
+    return paths or [os.path.join(data_dir, f'{table}.csv')]
+
+
+def _csv_options(table, usecols, parse_dates=True):
+    dtypes, dates = {}, []
+    for column in usecols:
+        spec = SCHEMAS[table][column]
+        if isinstance(spec, list):
+            dtypes[column] = 'category'
+        elif spec.startswith('datetime64'):
+            if parse_dates:
+                dates.append(column)
+        else:
+            dtypes[column] = spec
+    return {'usecols': usecols, 'dtype': dtypes, 'parse_dates': dates}
+
+
+def _coerce_csv(frame, table, usecols, parse_dates=True):
+    for column in usecols:
+        spec = SCHEMAS[table][column]
+        if isinstance(spec, list):
+            extra = [c for c in frame[column].cat.categories if c not in spec]
+            frame[column] = frame[column].cat.set_categories(list(spec) + extra)
+        elif spec.startswith('datetime64') and parse_dates:
+            frame[column] = frame[column].astype(spec)
+    return frame[usecols]
+
+
+def parse_date_columns(frame, table):
+    """Convert a table's date columns that are still strings to their schema dtype, in place."""
+    for column, spec in SCHEMAS[table].items():
+        if column in frame and isinstance(spec, str) and spec.startswith('datetime64') \
+                and not pd.api.types.is_datetime64_any_dtype(frame[column]):
+            frame[column] = pd.to_datetime(frame[column]).astype(spec)
+    return frame
+
+
+def read_csv_table(data_dir, table, columns=None, parse_dates=True, **kwargs):
+    """
+    Load a table from CSV (single file or shard part files) with schema dtypes.
+    With parse_dates=False date columns stay strings (see parse_date_columns).
+    """
+    usecols = list(SCHEMAS[table]) if columns is None else list(columns)
+    options = _csv_options(table, usecols, parse_dates)
+    frames = [pd.read_csv(p, **options, **kwargs) for p in _csv_paths(data_dir, table)]
+    frame = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    return _coerce_csv(frame, table, usecols, parse_dates)
+
+
+def iter_table_chunks(data_dir, table, columns=None, chunk_rows=1_000_000, fmt='auto'):
+    """
+    Yield a table as typed DataFrames of at most chunk_rows rows, so memory is
+    bounded by the chunk size rather than the table size. Columnar parts are
+    sliced out of their memory maps; CSVs are parsed chunk by chunk.
+    """
+    usecols = list(SCHEMAS[table]) if columns is None else list(columns)
+    if use_columnar(data_dir, table, fmt):
+        parts, metas = _read_metas(table_dir(data_dir, table))
+        for meta_path, meta in zip(parts, metas):
+            part_dir = os.path.dirname(meta_path)
+            arrays = {column: np.load(os.path.join(part_dir, f'{column}.npy'), mmap_mode='r') for column in usecols}
+            categories = {column: meta['columns'][column]['categories'] for column in usecols
+                          if 'categories' in meta['columns'][column]}
+            for start in range(0, meta['rows'], chunk_rows):
+                yield _frame({column: np.array(array[start:start + chunk_rows]) for column, array in arrays.items()},
+                             categories)
+        return
+    options = _csv_options(table, usecols)
+    for path in _csv_paths(data_dir, table):
+        for chunk in pd.read_csv(path, chunksize=chunk_rows, **options):
+            yield _coerce_csv(chunk, table, usecols)
+
+
+def iter_csv_rows(path, table, columns=None, start=None, stop=None, chunk_rows=1_000_000):
+    """
+    Yield (frame, offsets) for the rows of one CSV file between the byte
+    offsets start (default: just past the header) and stop (default: its
+    size): typed frames of about chunk_rows rows, and the byte offsets of
+    their row boundaries (len(frame) + 1 of them). The bytes before start
+    are never read, and an unterminated last line is left for a later call.
+    Rows are split on newlines, so fields must not contain them.
+    """
+    usecols = list(SCHEMAS[table]) if columns is None else list(columns)
+    options = _csv_options(table, usecols)
+    with open(path, 'rb') as f:
+        names = f.readline().decode().rstrip('\r\n').split(',')
+        start = f.tell() if start is None else start
+        stop = os.fstat(f.fileno()).st_size if stop is None else stop
+        f.seek(start)
+        # Size the blocks from the mean length of the first lines
+        probe = f.read(min(1 << 16, max(stop - start, 0)))
+        block_bytes = chunk_rows * max(len(probe) // max(probe.count(b'\n'), 1), 1)
+        while start < stop:
+            f.seek(start)
+            block = f.read(min(block_bytes, stop - start))
+            cut = block.rfind(b'\n') + 1
+            if not cut:
+                if start + len(block) >= stop:
+                    return
+                block_bytes *= 2
+                continue
+            block = block[:cut]
+            offsets = start + np.concatenate([[0], np.flatnonzero(np.frombuffer(block, np.uint8) == 10) + 1])
+            frame = pd.read_csv(io.BytesIO(block), header=None, names=names, **options)
+            if len(frame) != len(offsets) - 1:
+                raise ValueError(f'{path}: rows between bytes {start} and {start + cut} are not one per line')
+            yield _coerce_csv(frame, table, usecols), offsets
+            start += cut
+
+
+def table_files(data_dir, table, fmt='auto'):
+    """Files a load_table call with the same fmt reads (all columns)."""
+    if use_columnar(data_dir, table, fmt):
+        return sorted(glob.glob(os.path.join(table_dir(data_dir, table), 'part-*', '*')))
+    return _csv_paths(data_dir, table)
+
+
+def load_table(data_dir, table, columns=None, fmt='auto'):
+    """
+    Load a table with typed columns. fmt='auto' uses the columnar copy when it
+    exists and is current (see use_columnar) and falls back to CSV otherwise.
+    """
+    if use_columnar(data_dir, table, fmt):
+        return read_table(table_dir(data_dir, table), columns)
+    return read_csv_table(data_dir, table, columns)
+
+
+def remove_parts(path):
+    """Delete every part of a columnar table."""
+    for old in list_parts(path):
+        part_dir = os.path.dirname(old)
+        for name in os.listdir(part_dir):
+            os.remove(os.path.join(part_dir, name))
+        os.rmdir(part_dir)
+
+
+def convert_csv(data_dir, table):
+    """Write the columnar copy of a CSV table. Returns the number of rows."""
+    source = csv_stamp(data_dir, table)
+    frame = read_csv_table(data_dir, table)
+    path = table_dir(data_dir, table)
+    remove_parts(path)
+    write_table(frame, path, table, source=source)
+    return len(frame)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert the CSV tables to the columnar format')
+    parser.add_argument('--data-dir', default='/home/ubuntu/interview_prep/project_1_wekruit/data')
+    parser.add_argument('--table', action='append', choices=list(SCHEMAS))
+    args = parser.parse_args()
+
+    for table in args.table or list(SCHEMAS):
+        rows = convert_csv(args.data_dir, table)
+        print(f"  ✓ {table}: {rows:,} rows -> {table_dir(args.data_dir, table)}/")
@@ -0,0 +1,87 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Out-of-core aggregation over activity logs larger than memory
+
+The activity log is read in bounded chunks (see storage.iter_table_chunks)
+and every chunk is folded into one accumulator holding only per-user and
+per-cell state:
+
+    first_seen:  (users, stages) funnel first-reach times -> engagement, funnel
+    active_bits: per-user weeks-after-signup bitset      -> cohort retention
+    sessions:    group x stage session_duration sums      -> duration stats
+    type_bits:   (users, stages) competition-type bitmask  -> segment slices
+
+Peak memory is the users table, this state and one chunk, whatever the size
+of the log. Accumulators built over different chunks (or processes) combine
+with merge(), and the results match the in-memory path exactly.
+"""
+
+import numpy as np
+import pandas as pd
+
+from funnel import (NEVER, empty_session_sums, fold_first_seen, merge_session_sums, session_frame,
+                    session_sums, user_funnel_state)
+from retention import active_offsets, counts_from_offsets
+from slicing import empty_type_bits, fold_type_bits
+
+CHUNK_ROWS = 1_000_000
+
+
+def new_accumulator(users, stages, granularity='W', horizon=16, group_col='variant_group', competitions=None):
+    """
+    Empty accumulator aligned with the rows of users. type_bits is only
+    tracked when competitions is given (chunks then need competition_id).
+    """
+    return {
+        'stages': list(stages),
+        'granularity': granularity,
+        'horizon': horizon,
+        'group_col': group_col,
+        'first_seen': np.full((len(users), len(stages)), NEVER, dtype=np.int64),
+        'active_bits': np.zeros(len(users), dtype=np.uint64),
+        'sessions': empty_session_sums(len(pd.Categorical(users[group_col]).categories), len(stages)),
+        'competitions': competitions,
+        'type_bits': None if competitions is None else empty_type_bits(
+            len(users), len(stages), len(pd.Categorical(competitions['competition_type']).categories)),
+        'rows': 0,
+    }
+
+
+def accumulate(acc, users, chunk):
+    """Fold one chunk of activity into the accumulator, in place."""
+    fold_first_seen(users, chunk, acc['stages'], acc['first_seen'])
+    active_offsets(users, chunk, acc['granularity'], acc['horizon'], acc['active_bits'])
+    if 'session_duration' in chunk:
+        session_sums(users, chunk, acc['stages'], acc['group_col'], acc['sessions'])
+    if acc['type_bits'] is not None:
+        fold_type_bits(users, chunk, acc['competitions'], acc['stages'], acc['type_bits'])
+    acc['rows'] += len(chunk)
+    return acc
+
+
+def merge(acc, other):
+    """Combine two accumulators over the same users, in place."""
+    np.minimum(acc['first_seen'], other['first_seen'], out=acc['first_seen'])
+    acc['active_bits'] |= other['active_bits']
+    merge_session_sums(acc['sessions'], other['sessions'])
+    if acc['type_bits'] is not None:
+        acc['type_bits'] |= other['type_bits']
+    acc['rows'] += other['rows']
+    return acc
+
+
+def results(acc, users):
+    """(funnel state, retention counts, session_duration frame) from an accumulator."""
+    funnel = user_funnel_state(users, acc['first_seen'], acc['stages'], acc['group_col'])
+    retention = counts_from_offsets(users, acc['active_bits'], acc['granularity'], acc['horizon'], acc['group_col'])
+    sessions = session_frame(acc['sessions'], funnel['groups'], acc['stages'])
+    return funnel, retention, sessions
+
+
+def stream_aggregates(users, chunks, stages, granularity='W', horizon=16, group_col='variant_group',
+                      competitions=None):
+    """Fold an iterable of activity chunks into a fresh accumulator."""
+    acc = new_accumulator(users, stages, granularity, horizon, group_col, competitions)
+    for chunk in chunks:
+        accumulate(acc, users, chunk)
+    return acc
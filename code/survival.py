@@ -0,0 +1,258 @@
+"""
+Project 1.1: Wekruit - A/B Testing Analysis
+Survival analysis of user churn: Kaplan-Meier curves, log-rank tests and Cox
+proportional hazards
+
+Everything works on sorted arrays rather than per-subject or per-stratum
+loops:
+
+    kaplan_meier:  one lexsort by (stratum, time), then events and at-risk
+                   counts per distinct time come from bincounts and positions
+                   in the sorted order, and the product-limit estimate and
+                   Greenwood variance are cumulative sums offset per stratum
+    logrank_test:  a (distinct times x groups) table of events and at-risk
+                   counts, so any number of groups is one pass
+    cox_ph:        Newton-Raphson on the partial likelihood. Subjects are
+                   sorted by descending time, so every risk set is a prefix
+                   and its sums are cumulative sums; the score and
+                   information matrix are weighted X^T X products, never an
+                   n x p x p array. Ties use Efron's method (or Breslow).
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2, norm
+
+
+def _stratum_cumsum(values, stratum):
+    """Cumulative sum of values restarting at every change of the (sorted) stratum codes."""
+    total = np.cumsum(values, axis=0)
+    starts = np.flatnonzero(np.r_[True, stratum[1:] != stratum[:-1]])
+    before = np.concatenate([np.zeros((1,) + total.shape[1:]), total[starts[1:] - 1]])
+    lengths = np.diff(np.r_[starts, len(stratum)])
+    return total - np.repeat(before, lengths, axis=0)
+
+
+def kaplan_meier(time, event, strata=None, alpha=0.05):
+    """
+    Product-limit survival curves for every stratum at once.
+
+    time and event are per-subject arrays; strata is an optional array of
+    stratum labels. Returns a frame with one row per stratum and distinct
+    time: at_risk, events, censored, survival and its 1 - alpha interval
+    (Greenwood variance on the log(-log) scale, which stays within [0, 1]).
+    """
+    time = np.asarray(time, dtype=float)
+    event = np.asarray(event).astype(bool)
+    if strata is None:
+        labels, code = np.array(['overall'], dtype=object), np.zeros(len(time), dtype=np.int64)
+    else:
+        labels, code = np.unique(np.asarray(strata), return_inverse=True)
+        code = code.reshape(-1)
+
+    order = np.lexsort((time, code))
+    time, event, code = time[order], event[order], code[order]
+
+    # One row per distinct (stratum, time)
+    first = np.flatnonzero(np.r_[True, (code[1:] != code[:-1]) | (time[1:] != time[:-1])])
+    point_code = code[first]
+    exits = np.diff(np.r_[first, len(time)])
+    events = np.add.reduceat(event.astype(np.int64), first)
+    stratum_start = np.searchsorted(code, point_code, side='left')
+    stratum_size = np.searchsorted(code, point_code, side='right') - stratum_start
+    at_risk = stratum_size - (first - stratum_start)
+
+    # S(t) = prod (1 - d/n); a point where everyone at risk churns sets it to 0 for good
+    wiped = events == at_risk
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_step = np.where(wiped, 0.0, np.log1p(-events / at_risk))
+        greenwood_step = np.where(wiped, 0.0, events / (at_risk * (at_risk - events)))
+    steps = _stratum_cumsum(np.stack([log_step, greenwood_step, wiped], axis=1), point_code)
+    survival = np.where(steps[:, 2] > 0, 0.0, np.exp(steps[:, 0]))
+
+    z = norm.ppf(1 - alpha / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_survival = np.log(survival)
+        se = np.sqrt(steps[:, 1]) / np.abs(log_survival)
+        ci_low = np.exp(-np.exp(np.log(-log_survival) + z * se))
+        ci_high = np.exp(-np.exp(np.log(-log_survival) - z * se))
+    # Before the first event the curve is exactly 1; after a wipe-out exactly 0
+    flat = (survival == 1) | (survival == 0)
+    ci_low, ci_high = np.where(flat, survival, ci_low), np.where(flat, survival, ci_high)
+
+    return pd.DataFrame({
+        'stratum': labels[point_code],
+        'time': time[first],
+        'at_risk': at_risk,
+        'events': events,
+        'censored': exits - events,
+        'survival': survival,
+        'ci_low': ci_low,
+        'ci_high': ci_high,
+    })
+
+
+def median_survival(km):
+    """Median survival time per stratum of a kaplan_meier frame (inf if never reached)."""
+    reached = km[km['survival'] <= 0.5].groupby('stratum', sort=False)['time'].min()
+    return reached.reindex(km['stratum'].unique(), fill_value=np.inf)
+
+
+def logrank_test(time, event, groups):
+    """
+    Log-rank test that the survival curves of all groups are equal.
+    Returns a dict with observed and expected events per group, the
+    chi-square statistic, degrees of freedom and p-value.
+    """
+    time = np.asarray(time, dtype=float)
+    event = np.asarray(event).astype(bool)
+    labels, group = np.unique(np.asarray(groups), return_inverse=True)
+    group = group.reshape(-1)
+    k = len(labels)
+
+    times, t_idx = np.unique(time, return_inverse=True)
+    cell = t_idx.reshape(-1) * k + group
+    deaths = np.bincount(cell, weights=event, minlength=len(times) * k).reshape(-1, k)
+    exits = np.bincount(cell, minlength=len(times) * k).reshape(-1, k)
+    at_risk = np.cumsum(exits[::-1], axis=0)[::-1]
+
+    keep = deaths.sum(axis=1) > 0
+    deaths, at_risk = deaths[keep], at_risk[keep]
+    d, n = deaths.sum(axis=1), at_risk.sum(axis=1)
+    share = at_risk / n[:, None]
+    expected = (d[:, None] * share).sum(axis=0)
+    observed = deaths.sum(axis=0)
+
+    # Hypergeometric covariance summed over event times
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(n > 1, d * (n - d) / (n - 1), 0.0)
+    cov = -np.einsum('t,tg,th->gh', scale, share, share)
+    cov[np.diag_indices(k)] += scale @ share
+
+    diff = (observed - expected)[:-1]
+    statistic = float(diff @ np.linalg.solve(cov[:-1, :-1], diff)) if k > 1 else 0.0
+    return {
+        'groups': list(labels),
+        'observed': observed,
+        'expected': expected,
+        'statistic': statistic,
+        'df': k - 1,
+        'p_value': float(chi2.sf(statistic, k - 1)) if k > 1 else 1.0,
+    }
+
+
+def design_matrix(frame, numeric=(), categorical=()):
+    """
+    Covariate matrix with numeric columns as-is and categorical columns
+    dummy coded against their first level. Returns (X, names).
+    """
+    parts = [frame[list(numeric)].astype(float)]
+    if categorical:
+        parts.append(pd.get_dummies(frame[list(categorical)].astype(str), drop_first=True, dtype=float))
+    design = pd.concat(parts, axis=1)
+    return design.to_numpy(), list(design.columns)
+
+
+def _risk_set_terms(beta, x, event, block, ends, tie_frac):
+    """Partial log-likelihood, score and information at beta (x sorted by descending time)."""
+    xb = x @ beta
+    shift = xb.max()
+    w = np.exp(xb - shift)
+    n_blocks = len(ends)
+
+    # Risk-set sums: everyone up to the end of the block of tied times
+    r0 = np.cumsum(w)[ends]
+    r1 = np.cumsum(w[:, None] * x, axis=0)[ends]
+    # Sums over the subjects who churn at each time (Efron removes them gradually)
+    we = w * event
+    d0 = np.bincount(block, weights=we, minlength=n_blocks)
+    d1 = np.stack([np.bincount(block, weights=we * x[:, j], minlength=n_blocks) for j in range(x.shape[1])], axis=1)
+
+    eb = block[event]
+    phi = r0[eb] - tie_frac * d0[eb]
+    mean = (r1[eb] - tie_frac[:, None] * d1[eb]) / phi[:, None]
+
+    log_lik = xb[event].sum() - np.log(phi).sum() - shift * event.sum()
+    score = x[event].sum(axis=0) - mean.sum(axis=0)
+
+    # sum_k (R2 - f D2) / phi_k without forming R2: a subject is in the risk set of
+    # every block from its own onwards, so it is weighted by the suffix sum of 1/phi
+    a = np.bincount(eb, weights=1 / phi, minlength=n_blocks)
+    c = np.bincount(eb, weights=tie_frac / phi, minlength=n_blocks)
+    a_suffix = np.cumsum(a[::-1])[::-1]
+    weight = w * a_suffix[block] - we * c[block]
+    information = (x * weight[:, None]).T @ x - mean.T @ mean
+    return log_lik, score, information
+
+
+def cox_ph(time, event, x, names=None, ties='efron', alpha=0.05, tol=1e-9, max_iter=50):
+    """
+    Cox proportional hazards fit by Newton-Raphson with step halving.
+
+    Returns a dict with summary (one row per covariate: coef, exp(coef),
+    se(coef), z, p and the 1 - alpha interval for coef), the partial
+    log-likelihood at the fit and at beta = 0, the likelihood-ratio test and
+    the number of iterations.
+    """
+    time = np.asarray(time, dtype=float)
+    event = np.asarray(event).astype(bool)
+    x = np.asarray(x, dtype=float)
+    names = names or [f'x{j}' for j in range(x.shape[1])]
+
+    order = np.argsort(-time, kind='stable')
+    time, event = time[order], event[order]
+    x = x[order] - x.mean(axis=0)  # centering leaves the coefficients unchanged
+
+    first = np.r_[True, time[1:] != time[:-1]]
+    block = np.cumsum(first) - 1
+    ends = np.r_[np.flatnonzero(first)[1:], len(time)] - 1
+
+    # Efron: the l-th of d tied churns sees the risk set minus l/d of the tied group
+    if ties == 'efron':
+        eb = block[event]
+        rank = np.arange(len(eb)) - np.searchsorted(eb, eb, side='left')
+        tie_frac = rank / np.bincount(eb)[eb]
+    elif ties == 'breslow':
+        tie_frac = np.zeros(event.sum())
+    else:
+        raise ValueError(f'unknown ties method {ties!r}')
+
+    beta = np.zeros(x.shape[1])
+    log_lik, score, information = _risk_set_terms(beta, x, event, block, ends, tie_frac)
+    null_log_lik = log_lik
+    for iteration in range(1, max_iter + 1):
+        step = np.linalg.solve(information, score)
+        candidate = beta + step
+        new = _risk_set_terms(candidate, x, event, block, ends, tie_frac)
+        while new[0] < log_lik - 1e-12 and np.abs(step).max() > tol:
+            step /= 2
+            candidate = beta + step
+            new = _risk_set_terms(candidate, x, event, block, ends, tie_frac)
+        converged = abs(new[0] - log_lik) < tol or np.abs(step).max() < tol
+        beta, (log_lik, score, information) = candidate, new
+        if converged:
+            break
+
+    se = np.sqrt(np.diag(np.linalg.inv(information)))
+    z = beta / se
+    margin = norm.ppf(1 - alpha / 2) * se
+    summary = pd.DataFrame({
+        'coef': beta,
+        'exp(coef)': np.exp(beta),
+        'se(coef)': se,
+        'z': z,
+        'p': 2 * norm.sf(np.abs(z)),
+        'coef_lower': beta - margin,
+        'coef_upper': beta + margin,
+    }, index=pd.Index(names, name='covariate'))
+    lr = 2 * (log_lik - null_log_lik)
+    return {
+        'summary': summary,
+        'log_likelihood': float(log_lik),
+        'null_log_likelihood': float(null_log_lik),
+        'lr_statistic': float(lr),
+        'lr_p_value': float(chi2.sf(lr, x.shape[1])),
+        'iterations': iteration,
+        'n': len(time),
+        'events': int(event.sum()),
+    }